@@ -0,0 +1,69 @@
+"""
+Database settings built from DJANGO_DB_* environment variables.
+
+PostgreSQL is used when DJANGO_DB_ENGINE=postgresql or DJANGO_DB_HOST is set
+(as in docker-compose.yml); otherwise the local SQLite file is used.
+"""
+import copy
+
+ENGINES = {
+    "postgresql": "django.db.backends.postgresql",
+    "sqlite3": "django.db.backends.sqlite3",
+}
+
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def database_settings(env, sqlite_path):
+    engine = env.get("DJANGO_DB_ENGINE") or ("postgresql" if env.get("DJANGO_DB_HOST") else "sqlite3")
+    engine = ENGINES.get(engine, engine)
+    if engine != ENGINES["postgresql"]:
+        return {
+            "ENGINE": engine,
+            "NAME": sqlite_path,
+        }
+
+    statement_timeout = int(env.get("DJANGO_DB_STATEMENT_TIMEOUT_MS", "30000"))
+    options = {}
+    if statement_timeout > 0:
+        options["options"] = f"-c statement_timeout={statement_timeout}"
+
+    # Django's pool (psycopg_pool) keeps connections open per worker; it
+    # replaces persistent connections, so CONN_MAX_AGE must stay 0 with it.
+    conn_max_age = int(env.get("DJANGO_DB_CONN_MAX_AGE", "60"))
+    if _flag(env.get("DJANGO_DB_POOL", "true")):
+        options["pool"] = {
+            "min_size": int(env.get("DJANGO_DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(env.get("DJANGO_DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(env.get("DJANGO_DB_POOL_TIMEOUT", "10")),
+        }
+        conn_max_age = 0
+
+    return {
+        "ENGINE": engine,
+        "NAME": env.get("DJANGO_DB_NAME", "airport_db"),
+        "USER": env.get("DJANGO_DB_USER", ""),
+        "PASSWORD": env.get("DJANGO_DB_PASSWORD", ""),
+        "HOST": env.get("DJANGO_DB_HOST", "localhost"),
+        "PORT": env.get("DJANGO_DB_PORT", "5432"),
+        "CONN_MAX_AGE": conn_max_age,
+        "CONN_HEALTH_CHECKS": _flag(env.get("DJANGO_DB_CONN_HEALTH_CHECKS", "true")),
+        "OPTIONS": options,
+    }
+
+
+def replica_settings(default, replica):
+    """
+    Settings of a replica of `default`: `replica` is a file path for SQLite
+    and `host[:port]` for PostgreSQL.
+    """
+    settings = copy.deepcopy(default)
+    if default["ENGINE"] == ENGINES["postgresql"]:
+        host, _, port = replica.partition(":")
+        settings.update(HOST=host, PORT=port or default["PORT"])
+    else:
+        settings["NAME"] = replica
+    settings["TEST"] = {"MIRROR": "default"}
+    return settings
@@ -14,6 +14,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from Airport.database import database_settings, replica_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'AirportApp.middleware.PerformanceMiddleware',
+    'AirportApp.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +89,35 @@ WSGI_APPLICATION = 'Airport.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 DATABASES = {
+    'default': database_settings(os.environ, BASE_DIR / 'db.sqlite3'),
+}
+
+# Read replicas: comma-separated file paths for SQLite, host[:port] for
+# PostgreSQL. GET, HEAD and OPTIONS requests read from them.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv("DJANGO_DB_REPLICAS", "").split(",")), start=1):
+    DATABASES[f"replica{index}"] = replica_settings(DATABASES["default"], replica.strip())
+    DATABASE_REPLICAS.append(f"replica{index}")
+DATABASE_ROUTERS = ["AirportApp.routers.ReplicaRouter"]
+# Seconds a client reads from the primary after a write, to see its own writes
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+AUTH_USER_MODEL = 'auth.User'
+
+# Cache
+# Use a shared backend (e.g. Redis) in production so invalidations reach every worker;
+# `manage.py check --deploy` warns about a process-local one.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv("DJANGO_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("DJANGO_CACHE_LOCATION", 'airport-api'),
     }
 }
 
-AUTH_USER_MODEL = 'auth.User'
+# Seconds a cached reference-data response is kept. Also how long other workers may serve a
+# stale response when the cache is not shared, so keep it short unless it is.
+API_RESPONSE_CACHE_TIMEOUT = int(os.getenv("API_RESPONSE_CACHE_TIMEOUT", "60"))
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,11 +165,35 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'AirportApp.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
 }
 
+# Users resolved from JWTs are kept in a per-process LRU for this many seconds (0 disables it)
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL", "60"))
+JWT_USER_CACHE_SIZE = int(os.getenv("JWT_USER_CACHE_SIZE", "10000"))
+
+# Share of requests measured by PerformanceMiddleware (0 disables it)
+PERF_SAMPLE_RATE = float(os.getenv("PERF_SAMPLE_RATE", "1.0"))
+# Add a Server-Timing header to sampled responses (defaults to DEBUG)
+PERF_SERVER_TIMING = os.getenv("PERF_SERVER_TIMING", str(DEBUG)) == "True"
+# Bearer token required by /metrics; when empty only staff sessions may read it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Serve flight and route lists from .values() rows instead of model instances
+API_FAST_LIST = os.getenv("API_FAST_LIST", "True") == "True"
+
+# Attempts for an auto order before it fails with 409 Conflict
+BOOKING_MAX_ATTEMPTS = int(os.getenv("BOOKING_MAX_ATTEMPTS", "5"))
+# Milliseconds concurrent orders for one flight are collected into one transaction (0 disables).
+# Every order then waits up to this long, contended or not: only worth it for flash sales
+# where many orders hit the same flight at once, with a window of a few milliseconds.
+BOOKING_GROUP_COMMIT_WINDOW_MS = float(os.getenv("BOOKING_GROUP_COMMIT_WINDOW_MS", "0"))
+
+# Seconds a seat hold keeps its seats before it can be swept
+SEAT_HOLD_TTL = int(os.getenv("SEAT_HOLD_TTL", "600"))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Airport API',
     'DESCRIPTION': 'API documentation for Airport project with flights, orders, and tickets',
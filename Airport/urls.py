@@ -19,7 +19,7 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
-from AirportApp.views import CreateUserView, ManageUserView, MyTokenObtainPairView
+from AirportApp.views import CreateUserView, ManageUserView, MyTokenObtainPairView, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -31,6 +31,7 @@ urlpatterns += [
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("me/", ManageUserView.as_view(), name="manage"),
+    path("metrics", metrics_view, name="metrics"),
 ]
 urlpatterns += [
     # Schema generation
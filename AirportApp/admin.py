@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from AirportApp.models import Order, Flight, AirplaneType, Airplane, Ticket, Crew, Airport, Route
+from AirportApp.models import Order, Flight, AirplaneType, Airplane, Ticket, Crew, Airport, Route, SeatHold
 
 admin.site.register(Crew)
 admin.site.register(Ticket)
@@ -10,3 +10,4 @@ admin.site.register(AirplaneType)
 admin.site.register(Route)
 admin.site.register(Flight)
 admin.site.register(Order)
+admin.site.register(SeatHold)
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class GroupConcat(models.Aggregate):
+    """
+    Comma-separated values of an expression across the group.
+
+    GROUP_CONCAT on SQLite and MySQL, STRING_AGG on PostgreSQL. With
+    `distinct=True` each value appears once; the order is not defined.
+    """
+    function = "GROUP_CONCAT"
+    template = "%(function)s(%(distinct)s%(expressions)s)"
+    allow_distinct = True
+    output_field = models.TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function="STRING_AGG",
+            template="%(function)s(%(distinct)s(%(expressions)s)::text, ',')",
+            **extra_context,
+        )
+
+
+def split_ids(value):
+    """Parse a GroupConcat of ids into a sorted list of ints."""
+    return sorted(int(item) for item in value.split(",")) if value else []
@@ -0,0 +1,146 @@
+"""
+Native async versions of the read-heavy flight endpoints.
+
+Under ASGI these run on the event loop: queries go through the async ORM
+and the worker keeps serving other requests while they wait on the
+database. Responses match the sync FlightViewSet endpoints, except that
+the list is forward-only (`next` but no `previous`).
+"""
+import base64
+import binascii
+from datetime import timedelta
+
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .fastpath import fast_rows, fast_values
+from .filters import FlightSearchFilter
+from .itinerary import asearch_itineraries
+from .models import Flight
+from .pagination import KeysetPagination
+from .serializers import ItinerarySearchSerializer
+from .views import FlightViewSet, itinerary_rows
+
+
+def _json(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, content_type="application/json", headers=headers
+    )
+
+
+async def authenticate(request):
+    """Resolve the JWT bearer user of `request` like the sync views do, or None."""
+    try:
+        # A malformed header or a rejected user raises AuthenticationFailed, an invalid token InvalidToken.
+        result = await CachedJWTAuthentication().aauthenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return None if result is None else result[0]
+
+
+def authenticated(view):
+    async def wrapper(request, *args, **kwargs):
+        request.user = await authenticate(request)
+        if request.user is None:
+            return _json(
+                {"detail": "Authentication credentials were not provided or are invalid."},
+                status=401,
+                headers={"WWW-Authenticate": 'Bearer realm="api"'},
+            )
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def encode_cursor(row):
+    value = f"{row['departure_time'].isoformat()} {row['id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        departure_time, flight_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(" ", 1)
+        departure_time = parse_datetime(departure_time)
+        flight_id = int(flight_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if departure_time is None:
+        return None
+    return departure_time, flight_id
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get(KeysetPagination.page_size_query_param, KeysetPagination.page_size))
+    except ValueError:
+        return KeysetPagination.page_size
+    return min(max(size, 1), KeysetPagination.max_page_size)
+
+
+@require_GET
+@authenticated
+async def flight_list(request):
+    """Flights ordered by departure, with the FlightViewSet list filters."""
+    filterset = FlightSearchFilter(request.GET, queryset=Flight.objects.all())
+    if not filterset.is_valid():
+        return _json(filterset.errors, status=400)
+    queryset = filterset.qs.order_by("departure_time", "id")
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return _json({"detail": "Invalid cursor"}, status=404)
+        departure_time, flight_id = position
+        queryset = queryset.filter(
+            Q(departure_time__gt=departure_time) | Q(departure_time=departure_time, id__gt=flight_id)
+        )
+
+    page_size = _page_size(request)
+    fields = FlightViewSet.fast_list_fields
+    labels = FlightViewSet.fast_list_labels
+    values = fast_values(queryset, fields, labels)[:page_size + 1]
+    page = [row async for row in values]
+
+    next_url = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_cursor(page[-1]))
+    return _json({"next": next_url, "results": fast_rows(Flight, fields, labels, page)})
+
+
+@require_GET
+@authenticated
+async def flight_itineraries(request):
+    """Async equivalent of FlightViewSet.itineraries."""
+    query = ItinerarySearchSerializer(data=request.GET)
+    if not query.is_valid():
+        return _json(query.errors, status=400)
+    params = query.validated_data
+    found = await asearch_itineraries(
+        params["from"],
+        params["to"],
+        params["departure_after"],
+        params["departure_before"],
+        max_legs=params["max_legs"],
+        min_connection=timedelta(minutes=params["min_connection"]),
+        max_connection=timedelta(minutes=params["max_connection"]),
+        sort=params["sort"],
+        limit=params["limit"],
+        min_seats=params["passengers"],
+    )
+
+    flight_ids = {flight_id for itinerary in found for flight_id in itinerary["flights"]}
+    flights = {}
+    if flight_ids:
+        queryset = Flight.objects.select_related(
+            *FlightViewSet.select_related_by_action["list"]
+        ).filter(id__in=flight_ids)
+        flights = {flight.id: flight async for flight in queryset}
+    return _json(itinerary_rows(found, flights))
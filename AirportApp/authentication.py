@@ -0,0 +1,142 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _version_key(user_id):
+    return f"user-version:{user_id}"
+
+
+def bump_user_version(user_id):
+    """
+    Invalidate every cached copy of the user: here at once, and in other
+    processes sharing the cache on their next lookup. Versions are random
+    rather than counters, so a cleared cache never brings an old one back.
+    """
+    cache.set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    user_cache.discard(user_id)
+
+
+def user_version(user_id):
+    return cache.get(_version_key(user_id), "")
+
+
+async def auser_version(user_id):
+    return await cache.aget(_version_key(user_id), "")
+
+
+class UserCache:
+    """
+    Process-local LRU of authenticated users keyed by user id and version.
+
+    Entries live for JWT_USER_CACHE_TTL seconds at most and the least
+    recently used ones are dropped beyond JWT_USER_CACHE_SIZE. Saving or
+    deleting a user bumps its version in the shared cache, so an entry
+    under the old version is never read again. Callers get a copy, so a
+    view changing request.user does not change the cached user.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, version):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, expires, user = entry
+            if entry_version != version or expires <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return copy.copy(user)
+
+    def set(self, user_id, version, user):
+        if settings.JWT_USER_CACHE_TTL <= 0 or settings.JWT_USER_CACHE_SIZE <= 0:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + settings.JWT_USER_CACHE_TTL, copy.copy(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.JWT_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users from `user_cache` instead of one query per request."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        version = user_version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, version, user)
+        else:
+            self._check_revoked(validated_token, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """`authenticate` for async views; only a cache miss leaves the event loop."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return await sync_to_async(super().get_user)(validated_token)
+        version = await auser_version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = await sync_to_async(super().get_user)(validated_token)
+            user_cache.set(user_id, version, user)
+        else:
+            self._check_revoked(validated_token, user)
+        return user
+
+    def _check_revoked(self, validated_token, user):
+        # The user is current, but this token may predate a password change.
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documents CachedJWTAuthentication as the bearer scheme it is."""
+    target_class = "AirportApp.authentication.CachedJWTAuthentication"
@@ -0,0 +1,241 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import AsyncClient, Client
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .metrics import QueryTimer
+from .models import Airplane, Airport, Crew, Flight, Route, Ticket
+from .seatmap import SeatMap
+
+TICKETS_PER_FLIGHT = 60
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed_dataset(tickets, seed=42):
+    """Seed a dataset of roughly `tickets` tickets, at half load factor."""
+    flights = max(1, tickets // TICKETS_PER_FLIGHT)
+    airports = max(10, min(500, flights // 20))
+    call_command(
+        "seed",
+        "--airports", str(airports),
+        "--routes", str(min(airports * (airports - 1), airports * 4)),
+        "--airplanes", "20",
+        "--crew", "50",
+        "--users", "20",
+        "--flights", str(flights),
+        "--fill-factor", "0.5",
+        "--seed", str(seed),
+        stdout=io.StringIO(),
+    )
+
+
+class EndpointBenchmark:
+    """Times every list, retrieve and create endpoint against the current data."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.user = User.objects.filter(username__startswith="user").order_by("id").first()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.counter = 0
+
+    def endpoints(self):
+        flight = Flight.objects.order_by("-seats_available", "id").first()
+        ticket = Ticket.objects.filter(order__user=self.user).order_by("id").first()
+        route = Route.objects.order_by("id").first()
+        airplane = Airplane.objects.order_by("id").first()
+        order = ticket.order
+        yield from (
+            ("list airports", "get", "/api/v1/airports/", None),
+            ("list crew", "get", "/api/v1/crew/", None),
+            ("list airplane-types", "get", "/api/v1/airplane-types/", None),
+            ("list airplanes", "get", "/api/v1/airplanes/", None),
+            ("list routes", "get", "/api/v1/routes/", None),
+            ("list flights", "get", "/api/v1/flights/", None),
+            ("list orders", "get", "/api/v1/orders/", None),
+            ("list my orders", "get", "/api/v1/orders/mine/", None),
+            ("list tickets", "get", "/api/v1/tickets/", None),
+            ("retrieve airport", "get", f"/api/v1/airports/{route.source_id}/", None),
+            ("retrieve airplane", "get", f"/api/v1/airplanes/{airplane.id}/", None),
+            ("retrieve route", "get", f"/api/v1/routes/{route.id}/", None),
+            ("retrieve flight", "get", f"/api/v1/flights/{flight.id}/", None),
+            ("retrieve order", "get", f"/api/v1/orders/{order.id}/", None),
+            ("retrieve ticket", "get", f"/api/v1/tickets/{ticket.id}/", None),
+            ("create airport", "post", "/api/v1/airports/", self.airport_payload),
+            ("create crew", "post", "/api/v1/crew/", lambda: {"first_name": "Bench", "second_name": self.unique()}),
+            ("create airplane-type", "post", "/api/v1/airplane-types/", lambda: {"name": f"Type {self.unique()}"}),
+            ("create airplane", "post", "/api/v1/airplanes/", lambda: {
+                "name": f"Plane {self.unique()}", "rows": 20, "seats_in_row": 6,
+                "airplane_type": airplane.airplane_type_id,
+            }),
+            ("create route", "post", "/api/v1/routes/", self.route_payload),
+            ("create flight", "post", "/api/v1/flights/", lambda: self.flight_payload(route, airplane)),
+            ("create order", "post", "/api/v1/orders/", lambda: {"flight_id": flight.id, "passenger_count": 1}),
+            ("create ticket", "post", "/api/v1/tickets/", lambda: self.ticket_payload(flight, order)),
+        )
+
+    def unique(self):
+        self.counter += 1
+        return f"{time.monotonic_ns()}-{self.counter}"
+
+    def airport_payload(self):
+        return {"name": f"Bench airport {self.unique()}", "closest_biggest_city": "Bench"}
+
+    def route_payload(self):
+        source = Airport.objects.create(**self.airport_payload())
+        destination = Airport.objects.create(**self.airport_payload())
+        return {"source": source.id, "destination": destination.id, "distance": 500}
+
+    def flight_payload(self, route, airplane):
+        departure = timezone.now() + timedelta(days=1)
+        return {
+            "route": route.id,
+            "airplane": airplane.id,
+            "departure_time": departure.isoformat(),
+            "arrival_time": (departure + timedelta(hours=1)).isoformat(),
+            "crew": list(Crew.objects.values_list("id", flat=True)[:2]),
+        }
+
+    def ticket_payload(self, flight, order):
+        flight = Flight.objects.select_related("airplane").get(pk=flight.pk)
+        row, seat = SeatMap.for_flight(flight).find_free(1)[0]
+        return {"row": row, "seat": seat, "flight": flight.id, "order": order.id}
+
+    def run(self):
+        results = {}
+        for name, method, url, payload in self.endpoints():
+            wall, queries, sql = [], [], []
+            for _ in range(self.repeat):
+                data = payload() if payload else None
+                timer = QueryTimer()
+                with connection.execute_wrapper(timer):
+                    started = time.perf_counter()
+                    response = getattr(self.client, method)(url, data, format="json")
+                    wall.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{name}: {method.upper()} {url} returned {response.status_code}")
+                queries.append(timer.count)
+                sql.append(timer.seconds * 1000)
+            results[name] = {
+                "p50_ms": round(statistics.median(wall), 3),
+                "p95_ms": round(percentile(wall, 0.95), 3),
+                "p99_ms": round(percentile(wall, 0.99), 3),
+                "queries": max(queries),
+                "sql_ms": round(statistics.median(sql), 3),
+            }
+        return results
+
+
+class ThroughputBenchmark:
+    """
+    Compares the sync flight endpoints served through the WSGI handler by a
+    pool of `concurrency` threads with their async versions served through
+    the ASGI handler by `concurrency` concurrent tasks on one event loop.
+
+    Both run in-process, without a server or network in between, so the
+    numbers compare the request handling models rather than deployments.
+    """
+
+    def __init__(self, requests, concurrency):
+        self.requests = requests
+        self.concurrency = concurrency
+        user = User.objects.filter(username__startswith="user").order_by("id").first()
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def endpoints(self):
+        flight = Flight.objects.select_related("route").order_by("departure_time", "id").first()
+        search = urlencode({
+            "from": flight.route.source_id,
+            "to": flight.route.destination_id,
+            "departure_after": (flight.departure_time - timedelta(hours=1)).isoformat(),
+        })
+        yield from (
+            ("list flights", "/api/v1/flights/", "/api/v1/async/flights/"),
+            ("search itineraries", f"/api/v1/flights/itineraries/?{search}", f"/api/v1/async/flights/itineraries/?{search}"),
+        )
+
+    def run_wsgi(self, url):
+        def get(_):
+            started = time.perf_counter()
+            response = Client().get(url, headers=self.headers)
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            return response.status_code, elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            samples = list(executor.map(get, range(self.requests)))
+        return self.summarize(samples, time.perf_counter() - started)
+
+    def run_asgi(self, url):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def get():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url, headers=self.headers)
+                    return response.status_code, time.perf_counter() - started
+
+            started = time.perf_counter()
+            samples = await asyncio.gather(*(get() for _ in range(self.requests)))
+            return self.summarize(samples, time.perf_counter() - started)
+
+        return asyncio.run(run())
+
+    def summarize(self, samples, wall):
+        errors = [status for status, _ in samples if status >= 400]
+        if errors:
+            raise RuntimeError(f"{len(errors)} requests failed, first with status {errors[0]}")
+        latencies = [elapsed * 1000 for _, elapsed in samples]
+        return {
+            "requests_per_second": round(len(samples) / wall, 1),
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+        }
+
+    def run(self):
+        results = {}
+        for name, sync_url, async_url in self.endpoints():
+            results[name] = {"wsgi": self.run_wsgi(sync_url), "asgi": self.run_asgi(async_url)}
+        return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Return regressions of `results` against `baseline`, both mapping dataset
+    size to endpoint results. p95 may grow by `tolerance` (a fraction);
+    query counts may not grow at all.
+    """
+    regressions = []
+    for size, endpoints in results.items():
+        for name, current in endpoints.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            if current["queries"] > previous["queries"]:
+                regressions.append(
+                    f"{size} tickets, {name}: {current['queries']} queries (baseline {previous['queries']})"
+                )
+            if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{size} tickets, {name}: p95 {current['p95_ms']} ms (baseline {previous['p95_ms']} ms)"
+                )
+    return regressions
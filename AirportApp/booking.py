@@ -0,0 +1,423 @@
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from .models import Flight, Order, SeatHold, Ticket
+from .seatmap import SeatMap
+
+SEAT_LOCK_STRIPES = 64
+RETRY_BASE_DELAY = 0.01
+
+_seat_locks = [threading.Lock() for _ in range(SEAT_LOCK_STRIPES)]
+
+
+class SeatConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Seats could not be allocated because of concurrent bookings, please retry."
+    default_code = "seat_conflict"
+
+
+class HoldExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "The seat hold has expired."
+    default_code = "hold_expired"
+
+
+@contextmanager
+def flight_locks(flight_ids):
+    """
+    Hold the in-process locks of several flights, striped so memory stays
+    bounded and taken in a fixed order so callers cannot deadlock.
+
+    They keep threads of one worker from racing on the same flight; the row
+    locks taken in `lock_flight` do the same across workers.
+    """
+    stripes = sorted({flight_id % SEAT_LOCK_STRIPES for flight_id in flight_ids})
+    with ExitStack() as stack:
+        for stripe in stripes:
+            stack.enter_context(_seat_locks[stripe])
+        yield
+
+
+def lock_flight(flight_id):
+    """Lock a flight row with its airplane loaded. Must run inside a transaction."""
+    try:
+        return (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane")
+            .get(id=flight_id)
+        )
+    except Flight.DoesNotExist:
+        raise ValidationError("Flight not found.")
+
+
+def lock_flight_for_booking(flight_id):
+    """
+    Lock a flight and release its expired holds, so their seats are free
+    again even before the next sweep. Must run inside a transaction.
+    """
+    flight = lock_flight(flight_id)
+    expired = list(
+        SeatHold.objects.filter(flight_id=flight_id, expires_at__lte=timezone.now())
+        .values_list("id", "seats")
+    )
+    if expired:
+        _release_holds(flight, expired)
+    return flight
+
+
+def allocate_seats(flight_id, passenger_count):
+    """
+    Lock a flight, reserve `passenger_count` seats in its seat map and
+    return the flight with the seats. Must run inside a transaction.
+    """
+    return _take_free_seats(lock_flight_for_booking(flight_id), passenger_count)
+
+
+def _find_free_seats(seat_map, passenger_count):
+    free_seats = seat_map.find_free(passenger_count)
+    if len(free_seats) < passenger_count:
+        raise ValidationError("Not enough free seats available on this flight.")
+    for row, seat in free_seats:
+        seat_map.take(row, seat)
+    return free_seats
+
+
+def _take_free_seats(flight, passenger_count):
+    seat_map = SeatMap.for_flight(flight)
+    free_seats = _find_free_seats(seat_map, passenger_count)
+    seat_map.save_to(flight)
+    return flight, free_seats
+
+
+def _merge_legs(legs):
+    seats_by_flight = {}
+    for flight_id, passenger_count in legs:
+        seats_by_flight[flight_id] = seats_by_flight.get(flight_id, 0) + passenger_count
+    # A fixed lock order keeps multi-flight bookings from deadlocking each other.
+    return sorted(seats_by_flight.items())
+
+
+def _book_once(user, legs):
+    with transaction.atomic():
+        order = Order.objects.create(user=user)
+        tickets = []
+        for flight_id, passenger_count in legs:
+            flight, free_seats = allocate_seats(flight_id, passenger_count)
+            tickets.extend(
+                Ticket(order=order, flight=flight, row=row, seat=seat)
+                for row, seat in free_seats
+            )
+        Ticket.objects.bulk_create(tickets)
+    return order
+
+
+def retry_booking(flight_ids, operation):
+    """
+    Run `operation` holding the locks of `flight_ids` and return its result.
+
+    Conflicts (a unique seat violation from a stale seat map, a lock timeout
+    or a deadlock) are retried up to BOOKING_MAX_ATTEMPTS times with jittered
+    exponential backoff, then reported as 409 instead of a server error.
+    """
+    attempts = settings.BOOKING_MAX_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            with flight_locks(flight_ids):
+                return operation()
+        except IntegrityError:
+            # Someone wrote tickets around the seat maps; rebuild them from rows.
+            Flight.objects.filter(pk__in=flight_ids).update(seat_map=None)
+        except OperationalError:
+            pass
+        if attempt + 1 < attempts:
+            time.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+    raise SeatConflict()
+
+
+def book_itinerary(user, legs):
+    """
+    Create one order with tickets on every leg, given as
+    `(flight_id, passenger_count)` pairs. Either every leg is booked or none.
+    """
+    legs = _merge_legs(legs)
+    return retry_booking([flight_id for flight_id, _ in legs], lambda: _book_once(user, legs))
+
+
+class _PendingBooking:
+    def __init__(self, user, passenger_count):
+        self.user = user
+        self.passenger_count = passenger_count
+        self.order = None
+        self.error = None
+
+
+class _Batch:
+    def __init__(self):
+        self.bookings = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class BookingCoordinator:
+    """
+    Group commit for single-flight bookings.
+
+    The first booking for a flight opens a batch and waits up to `window`
+    seconds (or until `max_batch` bookings joined) while concurrent bookings
+    for the same flight join it. It then books the whole batch in one
+    transaction: one flight lock, one seat map pass, one bulk_create each
+    for orders and tickets. Every caller gets its own order or error back.
+
+    Batches are per process; the flight's row lock still serializes
+    batches of different workers. The batch is written on the connection of
+    the thread that opened it.
+    """
+
+    def __init__(self, max_batch=200):
+        self.max_batch = max_batch
+        self.batches = 0
+        self.bookings = 0
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def book(self, user, flight_id, passenger_count, window):
+        booking = _PendingBooking(user, passenger_count)
+        with self._lock:
+            batch = self._open.get(flight_id)
+            leader = batch is None
+            if leader:
+                batch = self._open[flight_id] = _Batch()
+            batch.bookings.append(booking)
+            if len(batch.bookings) >= self.max_batch:
+                del self._open[flight_id]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(window)
+            with self._lock:
+                if self._open.get(flight_id) is batch:
+                    del self._open[flight_id]
+            try:
+                self._commit(flight_id, batch.bookings)
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if booking.error is not None:
+            raise booking.error
+        return booking.order
+
+    def _commit(self, flight_id, bookings):
+        try:
+            results = retry_booking([flight_id], lambda: _book_batch(flight_id, bookings))
+        except Exception as error:
+            for booking in bookings:
+                booking.error = error
+            return
+        for booking, (order, error) in zip(bookings, results):
+            booking.order = order
+            booking.error = error
+        with self._lock:
+            self.batches += 1
+            self.bookings += len(bookings)
+
+
+def _book_batch(flight_id, bookings):
+    """Book every pending booking that still fits; returns (order, error) pairs."""
+    with transaction.atomic():
+        flight = lock_flight_for_booking(flight_id)
+        seat_map = SeatMap.for_flight(flight)
+        seats = []
+        for booking in bookings:
+            free_seats = seat_map.find_free(booking.passenger_count)
+            if len(free_seats) < booking.passenger_count:
+                seats.append(None)
+                continue
+            for row, seat in free_seats:
+                seat_map.take(row, seat)
+            seats.append(free_seats)
+
+        orders = iter(Order.objects.bulk_create([
+            Order(user=booking.user)
+            for booking, free_seats in zip(bookings, seats)
+            if free_seats is not None
+        ]))
+        results = []
+        tickets = []
+        for free_seats in seats:
+            if free_seats is None:
+                results.append((None, ValidationError("Not enough free seats available on this flight.")))
+                continue
+            order = next(orders)
+            tickets.extend(Ticket(order=order, flight=flight, row=row, seat=seat) for row, seat in free_seats)
+            results.append((order, None))
+        Ticket.objects.bulk_create(tickets)
+        seat_map.save_to(flight)
+    return results
+
+
+coordinator = BookingCoordinator()
+
+
+def book_seats(user, flight_id, passenger_count):
+    """
+    Create an order with `passenger_count` tickets on a single flight,
+    group-committed with concurrent bookings of the same flight when
+    BOOKING_GROUP_COMMIT_WINDOW_MS is set. It is 0 by default: the leader
+    of a batch waits out the window even when nobody joins.
+    """
+    window = settings.BOOKING_GROUP_COMMIT_WINDOW_MS / 1000
+    if window <= 0:
+        return book_itinerary(user, [(flight_id, passenger_count)])
+    return coordinator.book(user, flight_id, passenger_count, window)
+
+
+def _release_holds(flight, holds):
+    """Free the seats of `holds`, given as (id, seats) pairs, on a locked flight."""
+    seat_map = SeatMap.for_flight(flight)
+    for _, seats in holds:
+        if len(seats) == len(seat_map.data):
+            seat_map.subtract(seats)
+    SeatHold.objects.filter(pk__in=[hold_id for hold_id, _ in holds]).delete()
+    seat_map.save_to(flight)
+
+
+def hold_seats(user, flight_id, passenger_count, ttl=None):
+    """
+    Reserve `passenger_count` seats on a flight for `ttl` seconds
+    (SEAT_HOLD_TTL by default).
+    """
+    ttl = settings.SEAT_HOLD_TTL if ttl is None else ttl
+
+    def hold():
+        with transaction.atomic():
+            flight = lock_flight_for_booking(flight_id)
+            seat_map = SeatMap.for_flight(flight)
+            free_seats = _find_free_seats(seat_map, passenger_count)
+            held = SeatMap(flight.airplane.rows, flight.airplane.seats_in_row)
+            for row, seat in free_seats:
+                held.take(row, seat)
+            seat_hold = SeatHold.objects.create(
+                flight=flight,
+                user=user,
+                seats=held.to_bytes(),
+                seat_count=len(free_seats),
+                expires_at=timezone.now() + timedelta(seconds=ttl),
+            )
+            # Saved after the hold exists, so its seats are not counted as sold.
+            seat_map.save_to(flight)
+            return seat_hold
+
+    return retry_booking([flight_id], hold)
+
+
+def save_ticket(serializer):
+    """
+    Save a ticket created or moved through the API. Its seat is checked
+    against the locked flight's seat map, so a seat sold or held by anyone
+    else is refused instead of being written around the map.
+    """
+    instance = serializer.instance
+    data = serializer.validated_data
+    flight_id = data["flight"].pk if "flight" in data else instance.flight_id
+    row = data.get("row", getattr(instance, "row", None))
+    seat = data.get("seat", getattr(instance, "seat", None))
+
+    def save():
+        with transaction.atomic():
+            flight = lock_flight_for_booking(flight_id)
+            if instance is None or (instance.flight_id, instance.row, instance.seat) != (flight_id, row, seat):
+                seat_map = SeatMap.for_flight(flight)
+                if seat_map.is_valid(row, seat) and seat_map.is_taken(row, seat):
+                    raise ValidationError({"seat": ["This seat is already taken."]})
+            return serializer.save()
+
+    return retry_booking([flight_id], save)
+
+
+def _user_hold(user, hold_id):
+    hold = SeatHold.objects.filter(user=user, pk=hold_id).only("id", "flight_id", "expires_at").first()
+    if hold is None:
+        raise NotFound("Hold not found.")
+    return hold
+
+
+def confirm_hold(user, hold_id):
+    """
+    Turn a live hold into an order with one ticket per held seat. The seats
+    are already taken in the seat map, so no seat search runs and no other
+    booking can conflict.
+    """
+    hold = _user_hold(user, hold_id)
+    if hold.expires_at <= timezone.now():
+        release_hold(user, hold_id)
+        raise HoldExpired()
+
+    def confirm():
+        with transaction.atomic():
+            flight = lock_flight(hold.flight_id)
+            seats = SeatHold.objects.filter(pk=hold.pk).values_list("seats", flat=True).first()
+            if seats is None:
+                raise NotFound("Hold not found.")
+            SeatHold.objects.filter(pk=hold.pk).delete()
+            order = Order.objects.create(user=user)
+            held = SeatMap(flight.airplane.rows, flight.airplane.seats_in_row, bytes(seats))
+            Ticket.objects.bulk_create(
+                Ticket(order=order, flight=flight, row=row, seat=seat) for row, seat in held.occupied()
+            )
+            # The seats stay taken in the map; they only move from held to sold.
+            Flight.objects.filter(pk=flight.pk).update(seats_sold=F("seats_sold") + len(held.occupied()))
+        return order
+
+    return retry_booking([hold.flight_id], confirm)
+
+
+def release_hold(user, hold_id):
+    """Give the seats of a hold back before it expires."""
+    hold = _user_hold(user, hold_id)
+
+    def release():
+        with transaction.atomic():
+            flight = lock_flight(hold.flight_id)
+            _release_holds(flight, list(SeatHold.objects.filter(pk=hold.pk).values_list("id", "seats")))
+
+    retry_booking([hold.flight_id], release)
+
+
+def sweep_expired_holds(batch_size=1000):
+    """Release every expired hold, one transaction per flight. Returns the number released."""
+    released = 0
+    now = timezone.now()
+    while True:
+        batch = list(
+            SeatHold.objects.filter(expires_at__lte=now)
+            .order_by("flight_id", "id")
+            .values_list("flight_id", "id")[:batch_size]
+        )
+        if not batch:
+            return released
+        hold_ids_by_flight = {}
+        for flight_id, hold_id in batch:
+            hold_ids_by_flight.setdefault(flight_id, []).append(hold_id)
+
+        for flight_id, hold_ids in hold_ids_by_flight.items():
+            def release(flight_id=flight_id, hold_ids=hold_ids):
+                with transaction.atomic():
+                    flight = lock_flight(flight_id)
+                    holds = list(SeatHold.objects.filter(pk__in=hold_ids).values_list("id", "seats"))
+                    _release_holds(flight, holds)
+                return len(holds)
+
+            released += retry_booking([flight_id], release)
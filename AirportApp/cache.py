@@ -0,0 +1,94 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import read_alias
+
+
+def _version_key(model):
+    return f"api-version:{model._meta.label_lower}"
+
+
+def bump_version(model):
+    """Invalidate every cached response built from `model` rows."""
+    key = _version_key(model)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_versions(models):
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    return ".".join(str(versions.get(key, 0)) for key in keys)
+
+
+def make_etag(data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    return '"%s"' % hashlib.sha1(payload.encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve responses of rarely changing models.
+
+    Keys combine the request path, the normalized query string and a version
+    per model in `cache_models`; saving or deleting any of those models bumps
+    its version, so stale entries are never read again. Responses carry a
+    strong ETag and a matching If-None-Match is answered with 304 straight
+    from the cache, before the database or the serializer is used.
+
+    Misses are rendered from the primary: a replica lagging behind the
+    write that bumped a version would otherwise store its stale rows under
+    the new version for API_RESPONSE_CACHE_TIMEOUT seconds.
+    """
+    cache_models = ()
+
+    def _response_cache_key(self, request):
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        ))
+        return "api-response:%s:%s?%s" % (
+            get_versions(self.cache_models or (self.queryset.model,)),
+            request.path,
+            query,
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self._response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            token = read_alias.set(None)
+            try:
+                response = handler(request, *args, **kwargs)
+            finally:
+                read_alias.reset(token)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (make_etag(response.data), response.data)
+            cache.set(key, cached, settings.API_RESPONSE_CACHE_TIMEOUT)
+        etag, data = cached
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
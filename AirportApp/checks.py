@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Response cache versions, replica pins and cached users are invalidated
+    through the default cache, which only works when every worker shares it.
+    """
+    if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            "The default cache is local to each process.",
+            hint=(
+                "With several workers, writes in one leave the others serving cached responses for up to "
+                "API_RESPONSE_CACHE_TIMEOUT seconds. Set DJANGO_CACHE_BACKEND to a shared backend such as "
+                "django.core.cache.backends.redis.RedisCache."
+            ),
+            id="AirportApp.W001",
+        )]
+    return []
@@ -0,0 +1,81 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses; exports themselves are streamed.
+        return json.dumps(data, cls=DjangoJSONEncoder).encode() + b"\n"
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    encoder = DjangoJSONEncoder()
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(
+            [encoder.default(value) if hasattr(value, "isoformat") else value for value in row]
+        )
+
+
+def _ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + "\n"
+
+
+class ExportMixin:
+    """
+    Adds an `export` action streaming every filtered row as CSV or NDJSON.
+
+    `export_columns` is a sequence of `(header, lookup)` pairs, where a
+    lookup is a field path or a query expression. Rows are read with
+    `values_list().iterator()`, so memory stays flat whatever the row count.
+
+    NDJSON is the default; CSV is chosen with `?format=csv` or `Accept:
+    text/csv`. Rows are streamed after the view and its middleware have
+    returned, so the query is pinned to the database the request was
+    routed to, and it is not part of the request's metrics.
+    """
+    export_columns = ()
+    export_chunk_size = EXPORT_CHUNK_SIZE
+
+    @action(detail=False, methods=["get"], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        export_format = request.accepted_renderer.format
+        header = [name for name, _ in self.export_columns]
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = (
+            queryset.using(queryset.db)
+            .order_by("pk")
+            .values_list(*[lookup for _, lookup in self.export_columns])
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        if export_format == "csv":
+            response = StreamingHttpResponse(_csv_lines(header, rows), content_type="text/csv; charset=utf-8")
+        else:
+            response = StreamingHttpResponse(_ndjson_lines(header, rows), content_type="application/x-ndjson")
+        filename = f"{self.basename}.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,37 @@
+import django_filters
+
+from .models import Flight
+
+
+class FlightFilter(django_filters.FilterSet):
+    """
+    Flight search in one query: city and airport names are matched through
+    the route's airports, all of them indexed, and departure bounds use the
+    (route, departure_time) index.
+    """
+    source_city = django_filters.CharFilter(field_name="route__source__closest_biggest_city")
+    destination_city = django_filters.CharFilter(field_name="route__destination__closest_biggest_city")
+    source_airport = django_filters.CharFilter(field_name="route__source__name")
+    destination_airport = django_filters.CharFilter(field_name="route__destination__name")
+    departure_after = django_filters.IsoDateTimeFilter(field_name="departure_time", lookup_expr="gte")
+    departure_before = django_filters.IsoDateTimeFilter(field_name="departure_time", lookup_expr="lte")
+    has_seats = django_filters.BooleanFilter(method="filter_has_seats")
+    min_seats = django_filters.NumberFilter(field_name="seats_available", lookup_expr="gte")
+
+    class Meta:
+        model = Flight
+        fields = ["route", "airplane"]
+
+    def filter_has_seats(self, queryset, name, value):
+        if value:
+            return queryset.filter(seats_available__gt=0)
+        return queryset.filter(seats_available=0)
+
+
+class FlightSearchFilter(FlightFilter):
+    """
+    FlightFilter taking route and airplane as plain ids, so validating it
+    runs no queries and it can be used from async views.
+    """
+    route = django_filters.NumberFilter()
+    airplane = django_filters.NumberFilter()
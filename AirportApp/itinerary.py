@@ -0,0 +1,166 @@
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import F
+
+from .models import Flight
+
+MAX_EXPANSIONS = 50000
+MIN_CONNECTION = timedelta(minutes=45)
+MAX_CONNECTION = timedelta(hours=24)
+
+
+class FlightIndex:
+    """
+    Time-expanded index of flights: for every source airport, its flights
+    sorted by departure time, so the next connections after a given moment
+    are found with a binary search.
+    """
+
+    def __init__(self, flights):
+        by_source = defaultdict(list)
+        for flight in flights:
+            by_source[flight["source_id"]].append(flight)
+        self.flights = {}
+        self.departures = {}
+        for source_id, source_flights in by_source.items():
+            source_flights.sort(key=lambda flight: (flight["departure_time"], flight["id"]))
+            self.flights[source_id] = source_flights
+            self.departures[source_id] = [flight["departure_time"] for flight in source_flights]
+
+    @staticmethod
+    def queryset(departure_after, departure_before, min_seats=0):
+        """Rows of every flight departing inside the window, as one query."""
+        queryset = Flight.objects.filter(
+            departure_time__gte=departure_after,
+            departure_time__lte=departure_before,
+        )
+        if min_seats:
+            queryset = queryset.filter(seats_available__gte=min_seats)
+        return queryset.values(
+            "id",
+            "departure_time",
+            "arrival_time",
+            source_id=F("route__source_id"),
+            destination_id=F("route__destination_id"),
+            distance=F("route__distance"),
+        )
+
+    @classmethod
+    def load(cls, departure_after, departure_before, min_seats=0):
+        return cls(cls.queryset(departure_after, departure_before, min_seats))
+
+    @classmethod
+    async def aload(cls, departure_after, departure_before, min_seats=0):
+        rows = cls.queryset(departure_after, departure_before, min_seats)
+        return cls([row async for row in rows.aiterator(chunk_size=2000)])
+
+    def departing(self, airport_id, earliest, latest):
+        """Yield flights leaving `airport_id` between `earliest` and `latest`."""
+        flights = self.flights.get(airport_id)
+        if not flights:
+            return
+        start = bisect_left(self.departures[airport_id], earliest)
+        for flight in flights[start:]:
+            if flight["departure_time"] > latest:
+                return
+            yield flight
+
+
+def _cost(sort, first, last, distance):
+    if sort == "distance":
+        return distance, last["arrival_time"] - first["departure_time"]
+    return last["arrival_time"] - first["departure_time"], distance
+
+
+def search_itineraries(
+    source_id,
+    destination_id,
+    departure_after,
+    departure_before,
+    max_legs=3,
+    min_connection=MIN_CONNECTION,
+    max_connection=MAX_CONNECTION,
+    sort="time",
+    limit=5,
+    min_seats=0,
+):
+    """
+    Return up to `limit` itineraries from one airport to another, best first.
+
+    Every itinerary's first flight departs inside the window, and each
+    following flight departs between `min_connection` and `max_connection`
+    after the previous arrival. `sort` is "time" (total travel time) or
+    "distance"; both only grow as legs are added, so itineraries come out of
+    the best-first search already in order.
+    """
+    latest_departure = departure_before + (max_legs - 1) * max_connection
+    index = FlightIndex.load(departure_after, latest_departure, min_seats)
+    return _search(
+        index, source_id, destination_id, departure_after, departure_before,
+        max_legs, min_connection, max_connection, sort, limit,
+    )
+
+
+async def asearch_itineraries(
+    source_id,
+    destination_id,
+    departure_after,
+    departure_before,
+    max_legs=3,
+    min_connection=MIN_CONNECTION,
+    max_connection=MAX_CONNECTION,
+    sort="time",
+    limit=5,
+    min_seats=0,
+):
+    """`search_itineraries` loading its flights through the async ORM."""
+    latest_departure = departure_before + (max_legs - 1) * max_connection
+    index = await FlightIndex.aload(departure_after, latest_departure, min_seats)
+    return _search(
+        index, source_id, destination_id, departure_after, departure_before,
+        max_legs, min_connection, max_connection, sort, limit,
+    )
+
+
+def _search(
+    index, source_id, destination_id, departure_after, departure_before,
+    max_legs, min_connection, max_connection, sort, limit,
+):
+    queue = []
+    counter = 0
+    for flight in index.departing(source_id, departure_after, departure_before):
+        cost = _cost(sort, flight, flight, flight["distance"])
+        queue.append((cost, counter, (flight,), flight["distance"]))
+        counter += 1
+    heapq.heapify(queue)
+
+    results = []
+    expansions = 0
+    while queue and len(results) < limit and expansions < MAX_EXPANSIONS:
+        cost, _, legs, distance = heapq.heappop(queue)
+        last = legs[-1]
+        if last["destination_id"] == destination_id:
+            results.append({
+                "flights": [leg["id"] for leg in legs],
+                "departure_time": legs[0]["departure_time"],
+                "arrival_time": last["arrival_time"],
+                "duration": last["arrival_time"] - legs[0]["departure_time"],
+                "distance": distance,
+            })
+            continue
+        if len(legs) >= max_legs:
+            continue
+        expansions += 1
+        visited = {leg["source_id"] for leg in legs}
+        earliest = last["arrival_time"] + min_connection
+        latest = last["arrival_time"] + max_connection
+        for flight in index.departing(last["destination_id"], earliest, latest):
+            if flight["destination_id"] in visited:
+                continue
+            total = distance + flight["distance"]
+            heapq.heappush(queue, (_cost(sort, legs[0], flight, total), counter, legs + (flight,), total))
+            counter += 1
+    return results
@@ -0,0 +1,67 @@
+import json
+import platform
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from AirportApp.benchmarks import EndpointBenchmark, compare_with_baseline, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every /api/v1/ list, retrieve and create endpoint on growing datasets. "
+        "Runs against a throwaway test database, writes JSON results and fails on regressions "
+        "against a baseline file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated ticket counts")
+        parser.add_argument("--repeat", type=int, default=20, help="Requests per endpoint")
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--baseline", help="Results file to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 growth, as a fraction")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())["results"]
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                results = {}
+                for size in sizes:
+                    seed_dataset(size)
+                    self.stdout.write(f"Dataset with {size} tickets:")
+                    results[str(size)] = EndpointBenchmark(options["repeat"]).run()
+                    for name, result in results[str(size)].items():
+                        self.stdout.write(
+                            f"  {name:<22} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                            f"p99 {result['p99_ms']:>8.2f} ms  {result['queries']:>3} queries  "
+                            f"sql {result['sql_ms']:>7.2f} ms"
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        Path(options["output"]).write_text(json.dumps({
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "results": results,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+        if baseline is not None:
+            regressions = compare_with_baseline(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
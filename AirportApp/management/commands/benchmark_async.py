@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from AirportApp.benchmarks import ThroughputBenchmark, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync (WSGI) and async (ASGI) flight list and itinerary "
+        "search endpoints under concurrent load, against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickets", type=int, default=10000, help="Size of the seeded dataset")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and stack")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--output", help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                seed_dataset(options["tickets"])
+                results = ThroughputBenchmark(options["requests"], options["concurrency"]).run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, {options['concurrency']} concurrent, "
+            f"{options['tickets']} tickets:"
+        )
+        for name, stacks in results.items():
+            for stack, result in stacks.items():
+                self.stdout.write(
+                    f"  {name:<20} {stack}  {result['requests_per_second']:>8.1f} req/s  "
+                    f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms"
+                )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
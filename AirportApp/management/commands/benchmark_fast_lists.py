@@ -0,0 +1,76 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from AirportApp.models import Airplane, AirplaneType, Airport, Flight, Route
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare the fast .values() list path with the serializer path on throwaway data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Flights and routes to create")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["rows"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        airplane_type = AirplaneType.objects.create(name="Benchmark type")
+        airplane = Airplane.objects.create(name="Benchmark plane", rows=30, seats_in_row=6, airplane_type=airplane_type)
+        airports = Airport.objects.bulk_create(
+            Airport(name=f"Benchmark airport {i}", closest_biggest_city=f"City {i}") for i in range(rows + 1)
+        )
+        routes = Route.objects.bulk_create(
+            Route(source=airports[i], destination=airports[i + 1], distance=100 + i) for i in range(rows)
+        )
+        now = timezone.now()
+        Flight.objects.bulk_create(
+            Flight(
+                route=route,
+                airplane=airplane,
+                departure_time=now + timedelta(minutes=i),
+                arrival_time=now + timedelta(minutes=i + 90),
+            )
+            for i, route in enumerate(routes)
+        )
+        client = APIClient()
+        client.force_authenticate(User(username="benchmark", is_active=True))
+
+        # Bypass the response cache so every request does the full work.
+        dummy_cache = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(ALLOWED_HOSTS=["testserver"], CACHES=dummy_cache):
+            for url in (f"/api/v1/flights/?page_size={min(rows, 500)}", "/api/v1/routes/"):
+                timings = {}
+                for fast in (False, True):
+                    with override_settings(API_FAST_LIST=fast):
+                        timings[fast] = self.measure(client, url, repeat)
+                slow_ms, fast_ms = timings[False], timings[True]
+                self.stdout.write(
+                    f"{url}: serializer {slow_ms:.1f} ms, fast path {fast_ms:.1f} ms "
+                    f"({slow_ms / fast_ms:.1f}x)"
+                )
+
+    def measure(self, client, url, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
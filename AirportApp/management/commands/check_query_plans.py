@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from AirportApp.queryplans import UnsupportedVendor, check_vendor, check_viewset
+from AirportApp.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the list query of every /api/v1/ ViewSet under each combination of its "
+        "filters and fail if any plan reads a whole table. Run it against a database with "
+        "production-like statistics: planners pick sequential scans for tiny tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--viewset", action="append", help="Only check these URL prefixes, e.g. flights")
+
+    def handle(self, *args, **options):
+        try:
+            check_vendor()
+        except UnsupportedVendor as error:
+            raise CommandError(str(error))
+        problems = 0
+        checked = 0
+        for prefix, viewset_class, _ in router.registry:
+            if options["viewset"] and prefix not in options["viewset"]:
+                continue
+            for combination, tables, plan in check_viewset(viewset_class, prefix):
+                checked += 1
+                label = f"{prefix} [{', '.join(combination) or 'no filters'}]"
+                if tables:
+                    problems += 1
+                    self.stdout.write(self.style.ERROR(f"{label}: full scan of {', '.join(tables)}"))
+                elif options["verbosity"] > 1:
+                    self.stdout.write(f"{label}: ok")
+                if options["verbosity"] > 1 or tables:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+        if problems:
+            raise CommandError(f"{problems} of {checked} query plans read a whole table.")
+        self.stdout.write(self.style.SUCCESS(f"{checked} query plans checked, no full scans."))
@@ -0,0 +1,189 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from AirportApp.cache import bump_version
+from AirportApp.models import Airplane, Airport, Crew, Flight, Route
+from AirportApp.routegraph import invalidate_route_graph
+
+
+class LineError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a flight schedule from CSV or NDJSON. Each record has source, destination, "
+        "airplane, departure_time, arrival_time, optional distance (creates a missing route) "
+        "and optional crew ('First Second' names separated by ';' in CSV, a list in NDJSON)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "ndjson"), help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+        file_format = options["format"] or ("ndjson" if path.suffix in (".ndjson", ".jsonl") else "csv")
+        batch_size = options["batch_size"]
+
+        self.airports = {airport.name: airport.id for airport in Airport.objects.only("id", "name")}
+        self.airplanes = {
+            airplane.name: (airplane.id, airplane.rows * airplane.seats_in_row)
+            for airplane in Airplane.objects.only("id", "name", "rows", "seats_in_row")
+        }
+        self.routes = {
+            (source_id, destination_id): route_id
+            for route_id, source_id, destination_id in Route.objects.values_list("id", "source_id", "destination_id")
+        }
+        self.crew = {}
+        for crew_id, first_name, second_name in Crew.objects.order_by("id").values_list("id", "first_name", "second_name"):
+            self.crew.setdefault(f"{first_name} {second_name}", crew_id)
+
+        imported = errors = 0
+        routes_created = 0
+        batch = []
+        with path.open(newline="", encoding="utf-8") as source:
+            for line_number, record in self.read(source, file_format):
+                try:
+                    batch.append(self.parse(record))
+                except LineError as error:
+                    errors += 1
+                    self.stderr.write(f"line {line_number}: {error}")
+                    continue
+                if len(batch) >= batch_size:
+                    created = self.flush(batch, options["dry_run"])
+                    routes_created += created
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                routes_created += self.flush(batch, options["dry_run"])
+                imported += len(batch)
+
+        if routes_created:
+            invalidate_route_graph()
+            bump_version(Route)
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {imported} flights ({routes_created} new routes), {errors} lines with errors."
+        ))
+
+    def read(self, source, file_format):
+        if file_format == "csv":
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                self.stderr.write(f"line {line_number}: invalid JSON ({error.msg})")
+
+    def parse(self, record):
+        def required(name):
+            value = record.get(name)
+            if value in (None, ""):
+                raise LineError(f"missing {name}")
+            return value
+
+        source_id = self.airports.get(required("source"))
+        if source_id is None:
+            raise LineError(f"unknown airport {record['source']!r}")
+        destination_id = self.airports.get(required("destination"))
+        if destination_id is None:
+            raise LineError(f"unknown airport {record['destination']!r}")
+        if source_id == destination_id:
+            raise LineError("source and destination are the same airport")
+
+        airplane = self.airplanes.get(required("airplane"))
+        if airplane is None:
+            raise LineError(f"unknown airplane {record['airplane']!r}")
+
+        departure_time = self.parse_time(required("departure_time"), "departure_time")
+        arrival_time = self.parse_time(required("arrival_time"), "arrival_time")
+        if arrival_time <= departure_time:
+            raise LineError("arrival_time must be after departure_time")
+
+        route_key = (source_id, destination_id)
+        distance = None
+        if route_key not in self.routes:
+            try:
+                distance = int(required("distance"))
+            except (LineError, TypeError, ValueError):
+                raise LineError("route does not exist and no valid distance was given to create it")
+            if distance <= 0:
+                raise LineError("distance must be greater than zero")
+
+        crew = record.get("crew") or []
+        if isinstance(crew, str):
+            crew = [name.strip() for name in crew.split(";") if name.strip()]
+        crew_ids = []
+        for name in crew:
+            if name not in self.crew:
+                raise LineError(f"unknown crew member {name!r}")
+            crew_ids.append(self.crew[name])
+
+        return {
+            "route_key": route_key,
+            "distance": distance,
+            "airplane": airplane,
+            "departure_time": departure_time,
+            "arrival_time": arrival_time,
+            "crew_ids": crew_ids,
+        }
+
+    def parse_time(self, value, name):
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            raise LineError(f"{name} is not a valid datetime")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def flush(self, batch, dry_run):
+        """Write a batch of parsed rows, returning the number of routes created."""
+        new_routes = {}
+        for row in batch:
+            if row["route_key"] not in self.routes:
+                new_routes.setdefault(row["route_key"], row["distance"])
+        if dry_run:
+            for route_key in new_routes:
+                self.routes[route_key] = None
+            return len(new_routes)
+
+        with transaction.atomic():
+            created = Route.objects.bulk_create(
+                Route(source_id=source_id, destination_id=destination_id, distance=distance)
+                for (source_id, destination_id), distance in new_routes.items()
+            )
+            for route in created:
+                self.routes[(route.source_id, route.destination_id)] = route.id
+
+            flights = Flight.objects.bulk_create([
+                Flight(
+                    route_id=self.routes[row["route_key"]],
+                    airplane_id=row["airplane"][0],
+                    departure_time=row["departure_time"],
+                    arrival_time=row["arrival_time"],
+                    seats_available=row["airplane"][1],
+                )
+                for row in batch
+            ])
+            Flight.crew.through.objects.bulk_create([
+                Flight.crew.through(flight_id=flight.id, crew_id=crew_id)
+                for flight, row in zip(flights, batch)
+                for crew_id in dict.fromkeys(row["crew_ids"])
+            ])
+        return len(created)
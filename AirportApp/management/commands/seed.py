@@ -1,93 +1,224 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
-import random
 
-from AirportApp.models import Ticket, Order, Flight, AirplaneType, Airplane, Route, Airport, Crew
+from AirportApp.authentication import bump_user_version
+from AirportApp.cache import bump_version
+from AirportApp.models import SeatHold, Ticket, Order, Flight, AirplaneType, Airplane, Route, Airport, Crew
+from AirportApp.routegraph import invalidate_route_graph
+from AirportApp.seatmap import SeatMap
+
+CITIES = ["Kyiv", "Lviv", "Odesa", "Kharkiv", "Dnipro", "Warsaw", "Krakow", "Vienna", "Prague", "Berlin"]
+AIRPLANE_TYPES = [("Boeing 737", 20, 6), ("Airbus A320", 25, 6), ("Embraer 190", 25, 4), ("ATR 72", 18, 4)]
+CRUISE_SPEED_KMH = 800
+# A fixed default keeps `seed --seed N` reproducible from one day to the next.
+DEFAULT_START = date(2030, 1, 1)
 
 
 class Command(BaseCommand):
-    help = "Seed database with test data for development"
+    help = (
+        "Seed database with test data. Sizes are configurable and generation is deterministic: "
+        "the same --seed and --start always rebuild the same dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=3)
+        parser.add_argument("--routes", type=int, default=3)
+        parser.add_argument("--airplanes", type=int, default=2)
+        parser.add_argument("--crew", type=int, default=5)
+        parser.add_argument("--users", type=int, default=3)
+        parser.add_argument("--flights", type=int, default=3)
+        parser.add_argument("--fill-factor", type=float, default=0.02, help="Share of seats sold per flight")
+        parser.add_argument("--days", type=int, default=30, help="Spread departures over this many days")
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=DEFAULT_START,
+            help=f"First departure day, YYYY-MM-DD (default: {DEFAULT_START})",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
 
     def handle(self, *args, **options):
-        # Clear old data (optional)
-        Ticket.objects.all().delete()
-        Order.objects.all().delete()
-        Flight.objects.all().delete()
-        Airplane.objects.all().delete()
-        AirplaneType.objects.all().delete()
-        Route.objects.all().delete()
-        Airport.objects.all().delete()
-        Crew.objects.all().delete()
-        User.objects.all().exclude(is_superuser=True).delete()
-
-        self.stdout.write(self.style.WARNING("Deleted old test data."))
-
-        # Create users
-        users = []
-        for i in range(3):
-            user = User.objects.create_user(
-                username=f"user{i+1}",
-                password="test1234"
+        if options["airports"] < 2:
+            raise CommandError("At least 2 airports are needed")
+        max_routes = options["airports"] * (options["airports"] - 1)
+        if not 1 <= options["routes"] <= max_routes:
+            raise CommandError(f"--routes must be between 1 and {max_routes} for {options['airports']} airports")
+        if not 0 <= options["fill_factor"] <= 1:
+            raise CommandError("--fill-factor must be between 0 and 1")
+        if options["airplanes"] < 1 or options["users"] < 1:
+            raise CommandError("At least one airplane and one user are needed")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.start = timezone.make_aware(datetime.combine(options["start"], datetime.min.time()))
+        started = time.perf_counter()
+
+        with self.phase("Deleted old test data"):
+            self.clear()
+        with self.phase(f"Created {options['users']} users"):
+            users = self.create_users(options["users"])
+        with self.phase(f"Created {options['crew']} crew"):
+            crew_ids = self.create_crew(options["crew"])
+        with self.phase(f"Created {options['airports']} airports and {options['routes']} routes"):
+            routes = self.create_routes(options["airports"], options["routes"])
+        with self.phase(f"Created {options['airplanes']} airplanes"):
+            airplanes = self.create_airplanes(options["airplanes"])
+        with self.phase(f"Created {options['flights']} flights with orders and tickets"):
+            tickets = self.create_flights(
+                options["flights"], routes, airplanes, crew_ids, users, options["fill_factor"], options["days"]
             )
-            users.append(user)
-        self.stdout.write(self.style.SUCCESS("Created users."))
-
-        # Create crew
-        crew_members = []
-        for i in range(5):
-            c = Crew.objects.create(first_name=f"Crew{i+1}", second_name="Member")
-            crew_members.append(c)
-        self.stdout.write(self.style.SUCCESS("Created crew."))
-
-        # Airports
-        kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
-        lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
-        odessa = Airport.objects.create(name="Odesa Intl", closest_biggest_city="Odesa")
-
-        # Routes
-        r1 = Route.objects.create(source=kyiv, destination=lviv, distance=540)
-        r2 = Route.objects.create(source=lviv, destination=odessa, distance=620)
-        r3 = Route.objects.create(source=odessa, destination=kyiv, distance=480)
 
-        self.stdout.write(self.style.SUCCESS("Created airports and routes."))
-
-        # Airplane types
-        boeing = AirplaneType.objects.create(name="Boeing 737")
-        airbus = AirplaneType.objects.create(name="Airbus A320")
-
-        # Airplanes
-        a1 = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=boeing)
-        a2 = Airplane.objects.create(name="UR-BBB", rows=25, seats_in_row=6, airplane_type=airbus)
-
-        self.stdout.write(self.style.SUCCESS("Created airplanes."))
-
-        # Flights
-        now = timezone.now()
+        invalidate_route_graph()
+        for model in (Airport, AirplaneType, Airplane, Crew, Route):
+            bump_version(model)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Test data seeded successfully! {tickets} tickets, {time.perf_counter() - started:.2f}s total."
+        ))
+
+    @contextmanager
+    def phase(self, message):
+        started = time.perf_counter()
+        yield
+        self.stdout.write(self.style.SUCCESS(f"{message} in {time.perf_counter() - started:.2f}s."))
+
+    def clear(self):
+        # Raw deletes skip the per-row signals and cascade collection, which
+        # would take hours on a production-sized dataset.
+        for model in (
+            Flight.crew.through, Ticket, Order, SeatHold, Flight, Airplane, AirplaneType, Route, Airport, Crew,
+        ):
+            model.objects.all()._raw_delete(model.objects.db)
+        User.objects.exclude(is_superuser=True).delete()
+
+    def create_users(self, count):
+        password = make_password("test1234")
+        User.objects.bulk_create(
+            (User(username=f"user{i + 1}", password=password) for i in range(count)),
+            batch_size=self.batch_size,
+        )
+        user_ids = list(User.objects.filter(username__startswith="user").order_by("id").values_list("id", flat=True))
+        # bulk_create skips the signals that invalidate cached users.
+        for user_id in user_ids:
+            bump_user_version(user_id)
+        return user_ids
+
+    def create_crew(self, count):
+        crew = Crew.objects.bulk_create(
+            (Crew(first_name=f"Crew{i + 1}", second_name="Member") for i in range(count)),
+            batch_size=self.batch_size,
+        )
+        return [member.id for member in crew]
+
+    def create_routes(self, airport_count, route_count):
+        airports = Airport.objects.bulk_create(
+            (
+                Airport(name=f"{CITIES[i % len(CITIES)]} Airport {i + 1}", closest_biggest_city=CITIES[i % len(CITIES)])
+                for i in range(airport_count)
+            ),
+            batch_size=self.batch_size,
+        )
+        pairs = set()
+        while len(pairs) < route_count:
+            source, destination = self.rng.sample(range(airport_count), 2)
+            pairs.add((source, destination))
+        routes = Route.objects.bulk_create(
+            (
+                Route(
+                    source_id=airports[source].id,
+                    destination_id=airports[destination].id,
+                    distance=self.rng.randint(200, 3000),
+                )
+                for source, destination in sorted(pairs)
+            ),
+            batch_size=self.batch_size,
+        )
+        return [(route.id, route.distance) for route in routes]
+
+    def create_airplanes(self, count):
+        types = AirplaneType.objects.bulk_create(AirplaneType(name=name) for name, _, _ in AIRPLANE_TYPES)
+        airplanes = []
+        for i in range(count):
+            index = self.rng.randrange(len(AIRPLANE_TYPES))
+            _, rows, seats_in_row = AIRPLANE_TYPES[index]
+            airplanes.append(Airplane(
+                name=f"UR-{i + 1:05d}", rows=rows, seats_in_row=seats_in_row, airplane_type=types[index]
+            ))
+        airplanes = Airplane.objects.bulk_create(airplanes, batch_size=self.batch_size)
+        return [(airplane.id, airplane.rows, airplane.seats_in_row) for airplane in airplanes]
+
+    def create_flights(self, count, routes, airplanes, crew_ids, users, fill_factor, days):
+        minutes = max(days, 1) * 24 * 60
+        tickets_created = 0
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            with transaction.atomic():
+                tickets_created += self.create_flight_batch(
+                    size, routes, airplanes, crew_ids, users, fill_factor, minutes
+                )
+        return tickets_created
+
+    def create_flight_batch(self, size, routes, airplanes, crew_ids, users, fill_factor, minutes):
+        rng = self.rng
         flights = []
-        for idx, route in enumerate([r1, r2, r3], start=1):
-            f = Flight.objects.create(
-                route=route,
-                airplane=random.choice([a1, a2]),
-                departure_time=now + timedelta(days=idx),
-                arrival_time=now + timedelta(days=idx, hours=2),
+        seat_plans = []
+        for _ in range(size):
+            route_id, distance = rng.choice(routes)
+            airplane_id, rows, seats_in_row = rng.choice(airplanes)
+            departure = self.start + timedelta(minutes=rng.randrange(0, minutes, 5))
+            duration = timedelta(minutes=30 + distance * 60 // CRUISE_SPEED_KMH)
+
+            capacity = rows * seats_in_row
+            sold = sorted(rng.sample(range(capacity), round(capacity * fill_factor)))
+            seat_map = SeatMap(rows, seats_in_row)
+            seats = []
+            for bit in sold:
+                row, seat = divmod(bit, seats_in_row)
+                seat_map.take(row + 1, seat + 1)
+                seats.append((row + 1, seat + 1))
+            seat_plans.append(seats)
+
+            flights.append(Flight(
+                route_id=route_id,
+                airplane_id=airplane_id,
+                departure_time=departure,
+                arrival_time=departure + duration,
+                seat_map=seat_map.to_bytes(),
+                seats_sold=len(seats),
+                seats_available=capacity - len(seats),
+            ))
+        flights = Flight.objects.bulk_create(flights)
+
+        if crew_ids:
+            Flight.crew.through.objects.bulk_create(
+                Flight.crew.through(flight_id=flight.id, crew_id=crew_id)
+                for flight in flights
+                for crew_id in rng.sample(crew_ids, min(len(crew_ids), rng.randint(2, 4)))
             )
-            f.crew.set(random.sample(crew_members, 2))
-            flights.append(f)
-
-        self.stdout.write(self.style.SUCCESS("Created flights."))
-
-        # Orders + Tickets
-        for user in users:
-            order = Order.objects.create(user=user)
-            for flight in flights:
-                # choose random seat
-                row = random.randint(1, flight.airplane.rows)
-                seat = random.randint(1, flight.airplane.seats_in_row)
-                Ticket.objects.create(row=row, seat=seat, flight=flight, order=order)
-
-        self.stdout.write(self.style.SUCCESS("Created orders and tickets."))
 
-        self.stdout.write(self.style.SUCCESS("✅ Test data seeded successfully!"))
+        # Sold seats are grouped into orders of one to four passengers.
+        orders = []
+        order_tickets = []
+        for flight, seats in zip(flights, seat_plans):
+            index = 0
+            while index < len(seats):
+                group = rng.randint(1, 4)
+                orders.append(Order(user_id=rng.choice(users)))
+                order_tickets.append((flight.id, seats[index:index + group]))
+                index += group
+        orders = Order.objects.bulk_create(orders, batch_size=self.batch_size)
+        tickets = [
+            Ticket(order_id=order.id, flight_id=flight_id, row=row, seat=seat)
+            for order, (flight_id, seats) in zip(orders, order_tickets)
+            for row, seat in seats
+        ]
+        Ticket.objects.bulk_create(tickets, batch_size=self.batch_size)
+        return len(tickets)
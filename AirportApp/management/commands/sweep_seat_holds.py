@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from AirportApp.booking import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Release expired seat holds in bulk. With --interval, keep sweeping every N seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--interval", type=float, default=0, help="Seconds between sweeps (0: sweep once)")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            released = sweep_expired_holds(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Released {released} expired seat holds in {time.perf_counter() - started:.2f}s."
+            ))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
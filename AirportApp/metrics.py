@@ -0,0 +1,153 @@
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_request = ContextVar("current_request_metrics", default=None)
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = QueryTimer()
+        self.serializer_seconds = 0.0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.serializer_seconds = 0.0
+        self.db_queries = 0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """Per-process request metrics keyed by (method, route, status)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, method, route, status, total, metrics, response_bytes):
+        key = (method, route, str(status))
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is None:
+                entry = self._routes[key] = RouteMetrics()
+            entry.duration.observe(total)
+            entry.db_duration.observe(metrics.queries.seconds)
+            entry.serializer_seconds += metrics.serializer_seconds
+            entry.db_queries += metrics.queries.count
+            entry.response_bytes += response_bytes
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+            for name, attribute, help_text in (
+                ("http_request_duration_seconds", "duration", "Request duration"),
+                ("http_request_db_duration_seconds", "db_duration", "Time spent in database queries per request"),
+            ):
+                lines.append(f"# HELP {name} {help_text}.")
+                lines.append(f"# TYPE {name} histogram")
+                for key, entry in routes:
+                    histogram = getattr(entry, attribute)
+                    labels = _labels(key)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            for name, attribute, help_text in (
+                ("http_request_db_queries_total", "db_queries", "Database queries run"),
+                ("http_request_serializer_seconds_total", "serializer_seconds", "Time spent in serializers"),
+                ("http_response_size_bytes_total", "response_bytes", "Response body bytes sent"),
+            ):
+                lines.append(f"# HELP {name} {help_text}.")
+                lines.append(f"# TYPE {name} counter")
+                for key, entry in routes:
+                    value = getattr(entry, attribute)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f"{name}{{{_labels(key)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key):
+    method, route, status = key
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}",status="{status}"'
+
+
+registry = MetricsRegistry()
+
+
+
+def _timed(to_representation):
+    @functools.wraps(to_representation)
+    def timed(*args, **kwargs):
+        metrics = current_request.get()
+        if metrics is None:
+            return to_representation(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return to_representation(*args, **kwargs)
+        finally:
+            metrics.serializer_seconds += time.perf_counter() - started
+    return timed
+
+
+class SerializerTimingMixin:
+    """
+    View mixin adding the time spent rendering its serializers to the
+    metrics of sampled requests.
+
+    Only the serializer the view hands out is timed; nested serializers run
+    inside its `to_representation`, so nothing is counted twice.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_request.get() is not None:
+            serializer.to_representation = _timed(serializer.to_representation)
+        return serializer
@@ -0,0 +1,132 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestMetrics, current_request, registry
+from .routers import choose_read_alias, pin_to_primary, read_alias
+
+
+class PerformanceMiddleware:
+    """
+    Measures total time, database queries and time, serializer time and
+    response size of a sample of requests.
+
+    Sampled requests feed the per-route histograms served at /metrics and,
+    with PERF_SERVER_TIMING, get a `Server-Timing` header. PERF_SAMPLE_RATE
+    (0.0 - 1.0) sets the share of requests measured; unsampled requests cost
+    one random() call. Serializer time comes from views using
+    SerializerTimingMixin.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        started = time.perf_counter()
+        try:
+            with _execute_wrappers(metrics.queries):
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        started = time.perf_counter()
+        # Async ORM queries run in the request's sync thread, not on the
+        # event loop, so the wrapper has to be installed on that thread's
+        # connections.
+        wrappers = await sync_to_async(_enter_execute_wrappers)(metrics.queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+            current_request.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    def _sampled(self):
+        sample_rate = settings.PERF_SAMPLE_RATE
+        return sample_rate > 0 and (sample_rate >= 1 or random.random() < sample_rate)
+
+    def _finish(self, request, response, metrics, total):
+        if settings.PERF_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join((
+                f"total;dur={total * 1000:.2f}",
+                f'db;dur={metrics.queries.seconds * 1000:.2f};desc="{metrics.queries.count} queries"',
+                f"serializer;dur={metrics.serializer_seconds * 1000:.2f}",
+            ))
+
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match is not None else "<unmatched>"
+        if route != "metrics":
+            size = 0 if response.streaming else len(response.content)
+            registry.observe(request.method, route, response.status_code, total, metrics, size)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes the reads of GET/HEAD/OPTIONS requests to a replica from
+    DATABASE_REPLICAS. Writes go to the primary, and a client that wrote is
+    kept on the primary for REPLICA_STICKY_SECONDS so it reads its writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_alias.set(choose_read_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        token = read_alias.set(choose_read_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        pin_to_primary(request)
+        return response
+
+
+def _execute_wrappers(wrapper):
+    """Install `wrapper` on every database alias, replicas included."""
+    stack = ExitStack()
+    for alias_connection in connections.all():
+        stack.enter_context(alias_connection.execute_wrapper(wrapper))
+    return stack
+
+
+def _enter_execute_wrappers(wrapper):
+    with _execute_wrappers(wrapper) as stack:
+        return stack.pop_all()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+def fill_seat_maps(apps, schema_editor):
+    # Without a stored map every seat lookup and booking rebuilds it from tickets.
+    from AirportApp.seatmap import SeatMap
+
+    Flight = apps.get_model("AirportApp", "Flight")
+    Ticket = apps.get_model("AirportApp", "Ticket")
+    for flight in Flight.objects.select_related("airplane").iterator(chunk_size=2000):
+        seat_map = SeatMap(flight.airplane.rows, flight.airplane.seats_in_row)
+        for row, seat in Ticket.objects.filter(flight_id=flight.pk).values_list("row", "seat"):
+            if seat_map.is_valid(row, seat):
+                seat_map.take(row, seat)
+        flight.seat_map = seat_map.to_bytes()
+        flight.save(update_fields=["seat_map"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AirportApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='seat_map',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(fill_seat_maps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+def fill_seat_counters(apps, schema_editor):
+    Flight = apps.get_model("AirportApp", "Flight")
+    flights = Flight.objects.select_related("airplane").annotate(sold=models.Count("ticket"))
+    for flight in flights.iterator(chunk_size=2000):
+        capacity = flight.airplane.rows * flight.airplane.seats_in_row
+        flight.seats_sold = flight.sold
+        flight.seats_available = max(capacity - flight.sold, 0)
+        flight.save(update_fields=["seats_sold", "seats_available"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AirportApp', '0002_flight_seat_map'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='seats_available',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='seats_sold',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seat_counters, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,11 @@
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, router, transaction
 
 
 class Crew(models.Model):
-    first_name = models.CharField(max_length=255)
-    second_name = models.CharField(max_length=255)
+    first_name = models.CharField(max_length=255, db_index=True)
+    second_name = models.CharField(max_length=255, db_index=True)
 
 
 
@@ -15,7 +15,7 @@ class Crew(models.Model):
 
 class Airport(models.Model):
     name = models.CharField(max_length=255, unique=True)
-    closest_biggest_city = models.CharField(max_length=255)
+    closest_biggest_city = models.CharField(max_length=255, db_index=True)
 
     def __str__(self):
         return f"{self.name} ({self.closest_biggest_city})"
@@ -56,9 +56,15 @@ class Order(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="orders",
-        db_index=True,
+        # order_user_created_idx leads with user and serves lookups by user alone.
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user}"
 
@@ -80,7 +86,8 @@ class Airplane(models.Model):
 
 
 class Flight(models.Model):
-    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    # flight_route_departure_idx leads with route and serves lookups by route alone.
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, db_index=False)
     airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE)
     departure_time = models.DateTimeField(db_index=True)
     arrival_time = models.DateTimeField()
@@ -89,6 +96,9 @@ class Flight(models.Model):
         blank=True,
         related_name="flights",
     )
+    seat_map = models.BinaryField(null=True, editable=False)
+    seats_sold = models.IntegerField(default=0, editable=False)
+    seats_available = models.IntegerField(default=0, editable=False, db_index=True)
 
     class Meta:
         constraints = [
@@ -97,6 +107,33 @@ class Flight(models.Model):
                 name="arrival_after_departure",
             )
         ]
+        indexes = [
+            models.Index(fields=["route", "departure_time"], name="flight_route_departure_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is not None:
+            return super().save(*args, **kwargs)
+        if self._state.adding:
+            self.seats_available = max(self.airplane.rows * self.airplane.seats_in_row - self.seats_sold, 0)
+            return super().save(*args, **kwargs)
+
+        # The seat map and counters belong to bookings, which may have
+        # committed since this instance was loaded (an API or admin edit):
+        # take them from the locked row instead of writing back stale ones,
+        # and refit them to the airplane, which may have changed.
+        from .seatmap import SeatMap
+
+        using = kwargs.get("using") or router.db_for_write(Flight, instance=self)
+        with transaction.atomic(using=using):
+            seat_map, airplane_id = (
+                Flight.objects.using(using).select_for_update()
+                .filter(pk=self.pk).values_list("seat_map", "airplane_id").first()
+            ) or (None, None)
+            # Bits of another airplane's layout mean other seats: rebuild them.
+            self.seat_map = seat_map if airplane_id == self.airplane_id else None
+            SeatMap.for_flight(self).apply_to(self)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Flight {self.id} {self.route} at {self.departure_time}"
@@ -121,3 +158,26 @@ class Ticket(models.Model):
     def __str__(self):
         return f"Ticket {self.row}{self.seat} for flight {self.flight.id}"
 
+
+
+class SeatHold(models.Model):
+    """
+    Seats of a flight reserved for a user until `expires_at`.
+
+    `seats` is a seat map bitmap with only the held seats set; the same bits
+    are set in the flight's seat map, so other bookings skip them until the
+    hold is confirmed into tickets or released.
+    """
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seat_holds")
+    seats = models.BinaryField()
+    seat_count = models.IntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["flight", "expires_at"], name="hold_flight_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.id} of {self.seat_count} seats on flight {self.flight_id}"
@@ -0,0 +1,26 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over an indexed ordering.
+
+    Each page is fetched with a `WHERE key > cursor ... LIMIT n` query, so
+    page cost does not depend on how deep the client goes and no COUNT(*)
+    is ever issued.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class FlightPagination(KeysetPagination):
+    ordering = ("departure_time", "id")
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class TicketPagination(KeysetPagination):
+    ordering = ("-id",)
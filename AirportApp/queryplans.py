@@ -0,0 +1,107 @@
+import re
+from itertools import combinations
+
+import django_filters
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?\"?(\w+)\"?( USING .*)?")
+POSTGRESQL_SCAN = re.compile(r"Seq Scan on \"?(\w+)\"?")
+SORTS = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY"),
+    "postgresql": re.compile(r"\bSort\b"),
+}
+
+
+class UnsupportedVendor(Exception):
+    """EXPLAIN output of this database backend is not understood."""
+
+
+def check_vendor():
+    if connection.vendor not in SORTS:
+        raise UnsupportedVendor(f"Query plan checks do not support the {connection.vendor} database backend.")
+
+
+def full_scans(queryset):
+    """Tables read in full by `queryset`, according to the database's EXPLAIN."""
+    check_vendor()
+    plan = queryset.explain()
+    tables = {model._meta.db_table.lower(): model._meta.db_table for model in apps.get_models(include_auto_created=True)}
+    found = []
+    for line in plan.splitlines():
+        if connection.vendor == "sqlite":
+            match = SQLITE_SCAN.search(line)
+            if match is None or match.group(2):
+                continue
+        else:
+            match = POSTGRESQL_SCAN.search(line)
+            if match is None:
+                continue
+        table = tables.get(match.group(1).lower())
+        if table is not None and table not in found:
+            found.append(table)
+    return found, plan
+
+
+def sample_value(filter_):
+    """A value of the right type for `filter_`; plans do not depend on it."""
+    if isinstance(filter_, django_filters.BooleanFilter):
+        return True
+    if isinstance(filter_, django_filters.DateTimeFilter):
+        return timezone.now()
+    if isinstance(filter_, django_filters.DateFilter):
+        return timezone.localdate()
+    if isinstance(filter_, django_filters.CharFilter):
+        return "x"
+    return 1
+
+
+def list_queryset(viewset_class, prefix):
+    """
+    The list action's queryset, ordered like its pagination, with the page
+    size (None when unpaginated) and the filterset class of the ViewSet.
+    """
+    request = Request(APIRequestFactory().get(f"/api/v1/{prefix}/"))
+    request.user = User(pk=1, username="plan-check")
+    view = viewset_class(request=request, action="list", format_kwarg=None, args=(), kwargs={})
+    queryset = view.get_queryset()
+    page_size = None
+    pagination_class = view.pagination_class
+    if pagination_class is not None and issubclass(pagination_class, CursorPagination):
+        queryset = queryset.order_by(*pagination_class.ordering)
+        page_size = pagination_class.page_size
+    filterset_class = None
+    if DjangoFilterBackend in view.filter_backends:
+        filterset_class = DjangoFilterBackend().get_filterset_class(view, queryset)
+    return queryset, page_size, filterset_class
+
+
+def check_viewset(viewset_class, prefix):
+    """
+    EXPLAIN the list query of a ViewSet for every combination of its filters.
+
+    Yields (filter names, tables scanned in full, plan). The unfiltered
+    query is only checked when the list is paginated, since an unpaginated
+    list reads the whole table by design, and only flagged when it has to
+    sort: a scan in key order stops after one page.
+    """
+    queryset, page_size, filterset_class = list_queryset(viewset_class, prefix)
+    filters = filterset_class(queryset=queryset).filters if filterset_class is not None else {}
+    names = sorted(filters)
+    for size in range(0 if page_size else 1, len(names) + 1):
+        for combination in combinations(names, size):
+            filtered = queryset
+            for name in combination:
+                filtered = filters[name].filter(filtered, sample_value(filters[name]))
+            if page_size:
+                filtered = filtered[:page_size + 1]
+            tables, plan = full_scans(filtered)
+            if not combination and not SORTS[connection.vendor].search(plan):
+                tables = []
+            yield combination, tables, plan
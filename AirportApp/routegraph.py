@@ -0,0 +1,84 @@
+import heapq
+import threading
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .models import Route
+
+# The graph is built per process; its version lives in the shared cache, so
+# a route change in any process (including management commands) makes every
+# worker rebuild on its next lookup.
+GRAPH_VERSION_KEY = "route-graph-version"
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+class RouteGraph:
+    """
+    Directed graph of airports with routes as weighted edges.
+
+    Nodes are airport ids; each edge keeps the route id and its distance.
+    """
+
+    def __init__(self, routes):
+        self.version = None
+        self.edges = defaultdict(list)
+        for route_id, source_id, destination_id, distance in routes:
+            self.edges[source_id].append((destination_id, distance, route_id))
+
+    @classmethod
+    def from_db(cls):
+        return cls(Route.objects.values_list("id", "source_id", "destination_id", "distance"))
+
+    def shortest_path(self, source_id, destination_id, max_legs=None):
+        """
+        Return `(distance, route_ids)` of the shortest path using at most
+        `max_legs` routes, or None when the airports are not connected.
+        """
+        if source_id == destination_id:
+            return None
+        # States are (airport, legs used), so a longer path with fewer legs
+        # is not pruned by a shorter one that already used up the leg limit.
+        best = {(source_id, 0): 0}
+        queue = [(0, 0, source_id, ())]
+        while queue:
+            distance, legs, airport_id, path = heapq.heappop(queue)
+            if airport_id == destination_id:
+                return distance, list(path)
+            if best.get((airport_id, legs), distance) < distance:
+                continue
+            if max_legs is not None and legs >= max_legs:
+                continue
+            for next_id, leg_distance, route_id in self.edges.get(airport_id, ()):
+                state = (next_id, legs + 1)
+                total = distance + leg_distance
+                if total < best.get(state, total + 1):
+                    best[state] = total
+                    heapq.heappush(queue, (total, legs + 1, next_id, path + (route_id,)))
+        return None
+
+
+def get_route_graph():
+    """Return the process-wide route graph, rebuilding it when its shared version changed."""
+    global _graph
+    version = cache.get(GRAPH_VERSION_KEY)
+    graph = _graph
+    if graph is None or graph.version != version:
+        with _graph_lock:
+            if _graph is None or _graph.version != version:
+                # Tagged with the version read before loading, so a change
+                # made while loading triggers another rebuild.
+                _graph = RouteGraph.from_db()
+                _graph.version = version
+            graph = _graph
+    return graph
+
+
+def invalidate_route_graph():
+    global _graph
+    cache.set(GRAPH_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    with _graph_lock:
+        _graph = None
@@ -0,0 +1,66 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = "default"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+read_alias = ContextVar("read_alias", default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request, if any, and
+    everything else to the primary. Outside a replica-routed request (writes,
+    management commands, background jobs) all queries use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def client_key(request):
+    """Identify the client of a request for read-your-writes pinning, or None."""
+    credential = request.headers.get("Authorization") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return "replica-pin:" + hashlib.sha1(credential.encode()).hexdigest()
+
+
+def choose_read_alias(request):
+    """
+    The replica a request should read from: None (the primary) for writes,
+    when no replica is configured, or while the client is pinned to the
+    primary after a recent write.
+    """
+    if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return None
+    key = client_key(request)
+    if key is not None and cache.get(key):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin_to_primary(request):
+    """Keep the client of a write on the primary for REPLICA_STICKY_SECONDS."""
+    if request.method in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return
+    key = client_key(request)
+    if key is not None and settings.REPLICA_STICKY_SECONDS > 0:
+        cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
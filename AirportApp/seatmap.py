@@ -0,0 +1,138 @@
+from django.db.models import Sum
+
+from .models import SeatHold, Ticket
+
+FULL_BYTE = 0xFF
+
+
+class SeatMap:
+    """
+    Occupancy bitmap of a flight, one bit per seat in row-major order.
+
+    Seat (row, seat) is 1-based, as on tickets, and maps to bit
+    (row - 1) * seats_in_row + (seat - 1).
+    """
+
+    def __init__(self, rows, seats_in_row, data=None):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        self.size = rows * seats_in_row
+        length = (self.size + 7) // 8
+        if data is None:
+            data = bytes(length)
+        if len(data) != length:
+            raise ValueError("Seat map data does not match airplane size")
+        self.data = bytearray(data)
+
+    @classmethod
+    def for_flight(cls, flight):
+        """
+        Return the stored seat map of a flight with its airplane loaded,
+        rebuilding it from tickets and seat holds when missing or out of date.
+        """
+        airplane = flight.airplane
+        if flight.seat_map is not None:
+            try:
+                return cls(airplane.rows, airplane.seats_in_row, bytes(flight.seat_map))
+            except ValueError:
+                pass
+        seat_map = cls(airplane.rows, airplane.seats_in_row)
+        for row, seat in Ticket.objects.filter(flight=flight).values_list("row", "seat"):
+            if seat_map.is_valid(row, seat):
+                seat_map.take(row, seat)
+        for seats in SeatHold.objects.filter(flight=flight).values_list("seats", flat=True):
+            if len(seats) == len(seat_map.data):
+                seat_map.merge(seats)
+        return seat_map
+
+    def is_valid(self, row, seat):
+        return 1 <= row <= self.rows and 1 <= seat <= self.seats_in_row
+
+    def _bit(self, row, seat):
+        if not self.is_valid(row, seat):
+            raise ValueError("Seat is outside of this airplane")
+        return (row - 1) * self.seats_in_row + (seat - 1)
+
+    def _position(self, bit):
+        return bit // self.seats_in_row + 1, bit % self.seats_in_row + 1
+
+    def is_taken(self, row, seat):
+        bit = self._bit(row, seat)
+        return bool(self.data[bit >> 3] & (1 << (bit & 7)))
+
+    def take(self, row, seat):
+        bit = self._bit(row, seat)
+        self.data[bit >> 3] |= 1 << (bit & 7)
+
+    def release(self, row, seat):
+        bit = self._bit(row, seat)
+        self.data[bit >> 3] &= ~(1 << (bit & 7)) & FULL_BYTE
+
+    def find_free(self, count):
+        """Return up to `count` free seats in row-major order."""
+        free = []
+        if count <= 0:
+            return free
+        for index, byte in enumerate(self.data):
+            if byte == FULL_BYTE:
+                continue
+            base = index << 3
+            for offset in range(8):
+                bit = base + offset
+                if bit >= self.size:
+                    return free
+                if not byte & (1 << offset):
+                    free.append(self._position(bit))
+                    if len(free) == count:
+                        return free
+        return free
+
+    def merge(self, data):
+        """Take every seat set in `data`, another map of the same airplane."""
+        for index, byte in enumerate(bytes(data)):
+            self.data[index] |= byte
+
+    def subtract(self, data):
+        """Release every seat set in `data`, another map of the same airplane."""
+        for index, byte in enumerate(bytes(data)):
+            self.data[index] &= ~byte & FULL_BYTE
+
+    def occupied(self):
+        """Return the taken seats in row-major order."""
+        return [
+            self._position(bit)
+            for bit in range(self.size)
+            if self.data[bit >> 3] & (1 << (bit & 7))
+        ]
+
+    def occupied_count(self):
+        return sum(byte.bit_count() for byte in self.data)
+
+    def free_count(self):
+        return self.size - self.occupied_count()
+
+    def as_rows(self):
+        """Return the map as a list of rows, True meaning the seat is taken."""
+        return [
+            [self.is_taken(row, seat) for seat in range(1, self.seats_in_row + 1)]
+            for row in range(1, self.rows + 1)
+        ]
+
+    def to_bytes(self):
+        return bytes(self.data)
+
+    def apply_to(self, flight):
+        """
+        Set the map on a flight together with its seat counters. Seats of
+        the flight's holds are taken in the map but not sold, so apply after
+        creating or deleting holds.
+        """
+        held = SeatHold.objects.filter(flight_id=flight.pk).aggregate(held=Sum("seat_count"))["held"] or 0
+        flight.seat_map = self.to_bytes()
+        flight.seats_sold = max(self.occupied_count() - held, 0)
+        flight.seats_available = self.free_count()
+
+    def save_to(self, flight):
+        """Store the map on a flight together with its seat counters."""
+        self.apply_to(flight)
+        flight.save(update_fields=["seat_map", "seats_sold", "seats_available"])
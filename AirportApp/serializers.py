@@ -1,29 +1,33 @@
+from datetime import timedelta
+
 from django.contrib.auth.models import User
-from django.db import transaction
 from rest_framework import serializers
-from rest_framework.exceptions import ValidationError
-from .models import Crew, Ticket, Airport, Airplane, AirplaneType, Route, Flight, Order
+from .models import Crew, Ticket, Airport, Airplane, AirplaneType, Route, Flight, Order, SeatHold
+from .aggregates import split_ids
+from .booking import book_itinerary, book_seats, hold_seats
+from .seatmap import SeatMap
+from .sparse import SparseFieldsMixin
 
 
-class AirportSerializer(serializers.ModelSerializer):
+class AirportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Airport
         fields = '__all__'
 
 
-class AirplaneTypeSerializer(serializers.ModelSerializer):
+class AirplaneTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = AirplaneType
         fields = '__all__'
 
 
-class CrewSerializer(serializers.ModelSerializer):
+class CrewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Crew
         fields = '__all__'
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Route
@@ -31,13 +35,13 @@ class RouteSerializer(serializers.ModelSerializer):
 
 
 
-class AirplaneSerializer(serializers.ModelSerializer):
+class AirplaneSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Airplane
         fields = '__all__'
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = "__all__"
@@ -52,7 +56,7 @@ class OrderListSerializer(OrderSerializer):
     class Meta(OrderSerializer.Meta):
         fields = ("id", "created_at")
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "username", "email")
@@ -62,26 +66,46 @@ class OrderDetailSerializer(OrderSerializer):
     user = UserSerializer(read_only=True)
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    ticket_count = serializers.IntegerField(read_only=True)
+    flights = serializers.SerializerMethodField()
+    next_departure = serializers.DateTimeField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Order
+        fields = ("id", "created_at", "ticket_count", "flights", "next_departure")
+
+    def get_flights(self, order) -> list[int]:
+        return split_ids(order.flight_ids)
+
+
+class FlightSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Flight
-        fields = '__all__'
+        exclude = ("seat_map",)
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = '__all__'
 
+    def validate_order(self, order):
+        request = self.context.get("request")
+        if request is not None and order.user_id != request.user.id:
+            raise serializers.ValidationError("Order not found.")
+        return order
 
-class AirplaneListSerializer(serializers.ModelSerializer):
+
+class AirplaneListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     airplane_type = serializers.StringRelatedField()
+    expandable_fields = {"airplane_type": (AirplaneTypeSerializer, {})}
 
     class Meta:
         model = Airplane
         fields = ("id", "name", "airplane_type", "rows", "seats_in_row")
 
-class AirplaneDetailSerializer(serializers.ModelSerializer):
+class AirplaneDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     airplane_type = AirplaneTypeSerializer(read_only=True)
 
     class Meta:
@@ -89,16 +113,20 @@ class AirplaneDetailSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class RouteListSerializer(serializers.ModelSerializer):
+class RouteListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     source = serializers.StringRelatedField()
     destination = serializers.StringRelatedField()
+    expandable_fields = {
+        "source": (AirportSerializer, {}),
+        "destination": (AirportSerializer, {}),
+    }
 
     class Meta:
         model = Route
         fields = ("id", "source", "destination", "distance")
 
 
-class RouteDetailSerializer(serializers.ModelSerializer):
+class RouteDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     source = AirportSerializer(read_only=True)
     destination = AirportSerializer(read_only=True)
 
@@ -107,26 +135,31 @@ class RouteDetailSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class FlightListSerializer(serializers.ModelSerializer):
+class FlightListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     route = serializers.StringRelatedField()
     airplane = serializers.StringRelatedField()
+    expandable_fields = {
+        "route": (RouteDetailSerializer, {}),
+        "airplane": (AirplaneSerializer, {}),
+        "crew": (CrewSerializer, {"many": True}),
+    }
 
     class Meta:
         model = Flight
-        fields = ("id", "route", "airplane", "departure_time", "arrival_time")
+        fields = ("id", "route", "airplane", "departure_time", "arrival_time", "seats_available")
 
 
-class FlightDetailSerializer(serializers.ModelSerializer):
+class FlightDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     route = RouteDetailSerializer(read_only=True)
     airplane = AirplaneSerializer(read_only=True)
     crew = CrewSerializer(many=True, read_only=True)
 
     class Meta:
         model = Flight
-        fields = '__all__'
+        exclude = ("seat_map",)
 
 
-class TicketListSerializer(serializers.ModelSerializer):
+class TicketListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     flight = FlightDetailSerializer(read_only=True)
     order = serializers.StringRelatedField()
 
@@ -135,7 +168,7 @@ class TicketListSerializer(serializers.ModelSerializer):
         fields = ("id", "row", "seat", "flight", "order")
 
 
-class TicketDetailSerializer(serializers.ModelSerializer):
+class TicketDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     flight = FlightListSerializer(read_only=True)
     order = OrderSerializer(read_only=True)
 
@@ -144,9 +177,9 @@ class TicketDetailSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class AutoOrderSerializer(serializers.ModelSerializer):
+class AutoOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     flight_id = serializers.IntegerField(write_only=True)
-    passenger_count = serializers.IntegerField(write_only=True, default=1)
+    passenger_count = serializers.IntegerField(write_only=True, min_value=1, default=1)
 
     class Meta:
         model = Order
@@ -158,38 +191,72 @@ class AutoOrderSerializer(serializers.ModelSerializer):
         flight_id = validated_data.pop("flight_id")
         passenger_count = validated_data.pop("passenger_count", 1)
 
-        try:
-            flight = Flight.objects.select_related("airplane").get(id=flight_id)
-        except Flight.DoesNotExist:
-            raise ValidationError("Flight not found.")
-
-        airplane = flight.airplane
-        max_seats = airplane.rows * airplane.seats_in_row
-
-        # Get already booked seats
-        occupied = Ticket.objects.filter(flight=flight).values_list("row", "seat")
-        occupied_set = set(occupied)
-
-        # Find free seats
-        free_seats = []
-        for r in range(1, airplane.rows + 1):
-            for s in range(1, airplane.seats_in_row + 1):
-                if (r, s) not in occupied_set:
-                    free_seats.append((r, s))
-                    if len(free_seats) >= passenger_count:
-                        break
-            if len(free_seats) >= passenger_count:
-                break
-
-        if len(free_seats) < passenger_count:
-            raise ValidationError("Not enough free seats available on this flight.")
-
-        with transaction.atomic():
-            order = Order.objects.create(user=user)
-            tickets = [
-                Ticket(order=order, flight=flight, row=row, seat=seat)
-                for row, seat in free_seats
-            ]
-            Ticket.objects.bulk_create(tickets)
-
-        return order
\ No newline at end of file
+        return book_seats(user, flight_id, passenger_count)
+
+
+class OrderLegSerializer(serializers.Serializer):
+    flight_id = serializers.IntegerField()
+    passenger_count = serializers.IntegerField(min_value=1, default=1)
+
+
+class BulkOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    legs = OrderLegSerializer(many=True, write_only=True, allow_empty=False)
+    tickets = TicketSerializer(many=True, read_only=True, source="ticket_set")
+
+    class Meta:
+        model = Order
+        fields = ("id", "created_at", "user", "legs", "tickets")
+        read_only_fields = ("id", "created_at", "user")
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        legs = [(leg["flight_id"], leg["passenger_count"]) for leg in validated_data["legs"]]
+
+        return book_itinerary(user, legs)
+
+
+class SeatHoldSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    flight_id = serializers.IntegerField(write_only=True)
+    passenger_count = serializers.IntegerField(write_only=True, min_value=1, default=1)
+    seats = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SeatHold
+        fields = ("id", "flight", "flight_id", "passenger_count", "seat_count", "seats", "expires_at")
+        read_only_fields = ("id", "flight", "seat_count", "expires_at")
+
+    def get_seats(self, hold) -> list[list[int]]:
+        airplane = hold.flight.airplane
+        seat_map = SeatMap(airplane.rows, airplane.seats_in_row, bytes(hold.seats))
+        return [[row, seat] for row, seat in seat_map.occupied()]
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        return hold_seats(user, validated_data["flight_id"], validated_data["passenger_count"])
+
+
+class ItinerarySearchSerializer(serializers.Serializer):
+    to = serializers.IntegerField()
+    departure_after = serializers.DateTimeField()
+    departure_before = serializers.DateTimeField(required=False)
+    max_legs = serializers.IntegerField(min_value=1, max_value=4, default=3)
+    min_connection = serializers.IntegerField(min_value=0, default=45, help_text="Minutes")
+    max_connection = serializers.IntegerField(min_value=1, max_value=48 * 60, default=24 * 60, help_text="Minutes")
+    sort = serializers.ChoiceField(choices=("time", "distance"), default="time")
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=5)
+    passengers = serializers.IntegerField(min_value=0, default=0)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" is a keyword, so it cannot be declared as a class attribute.
+        fields["from"] = serializers.IntegerField()
+        return fields
+
+    def validate(self, attrs):
+        if "departure_before" not in attrs:
+            attrs["departure_before"] = attrs["departure_after"] + timedelta(days=1)
+        if attrs["departure_before"] < attrs["departure_after"]:
+            raise serializers.ValidationError("departure_before must not be earlier than departure_after.")
+        if attrs["min_connection"] >= attrs["max_connection"]:
+            raise serializers.ValidationError("min_connection must be shorter than max_connection.")
+        return attrs
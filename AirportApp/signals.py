@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import bump_user_version
+from .cache import bump_version
+from .models import Airplane, AirplaneType, Airport, Crew, Flight, Route, Ticket
+from .routegraph import invalidate_route_graph
+from .seatmap import SeatMap
+
+
+def _update_seat_map(flight_id, row, seat, taken):
+    with transaction.atomic():
+        flight = (
+            Flight.objects.select_for_update()
+            .select_related("airplane")
+            .filter(pk=flight_id)
+            .first()
+        )
+        if flight is None:
+            return
+        seat_map = SeatMap.for_flight(flight)
+        if seat_map.is_valid(row, seat):
+            if taken:
+                seat_map.take(row, seat)
+            else:
+                seat_map.release(row, seat)
+        seat_map.save_to(flight)
+
+
+@receiver(pre_save, sender=Ticket)
+def ticket_remember_seat(sender, instance, raw=False, **kwargs):
+    instance._previous_seat = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_seat = (
+        Ticket.objects.filter(pk=instance.pk).values_list("flight_id", "row", "seat").first()
+    )
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.flight_id, instance.row, instance.seat)
+    previous = getattr(instance, "_previous_seat", None)
+    if previous == current:
+        return
+    if previous is not None:
+        _update_seat_map(*previous, taken=False)
+    _update_seat_map(*current, taken=True)
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    _update_seat_map(instance.flight_id, instance.row, instance.seat, taken=False)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def route_changed(sender, **kwargs):
+    invalidate_route_graph()
+    # Drop a graph another thread may rebuild before this write commits.
+    transaction.on_commit(invalidate_route_graph)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=AirplaneType)
+@receiver(post_delete, sender=AirplaneType)
+@receiver(post_save, sender=Airplane)
+@receiver(post_delete, sender=Airplane)
+@receiver(post_save, sender=Crew)
+@receiver(post_delete, sender=Crew)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def reference_data_changed(sender, **kwargs):
+    bump_version(sender)
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, raw=False, **kwargs):
+    # Covers deactivation and password changes, which are saves too.
+    if raw:
+        return
+    bump_user_version(instance.pk)
+    transaction.on_commit(lambda: bump_user_version(instance.pk))
@@ -0,0 +1,164 @@
+"""
+Client-shaped responses.
+
+`?fields=id,flight.departure_time` keeps only the named fields, with dotted
+names reaching into nested objects, and `?expand=route,crew` replaces the
+relations a serializer lists in `expandable_fields` with nested objects.
+Unknown names are ignored. Only safe requests are shaped, so write
+serializers always validate their full set of fields.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_paths(value):
+    """Parse "a,b.c,b.d" into {"a": {}, "b": {"c": {}, "d": {}}}."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def requested_shape(request):
+    """The (fields, expand) trees of `request`; fields is None when not restricted."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    params = request.query_params
+    fields = parse_paths(params.get("fields", "")) or None
+    return fields, parse_paths(params.get("expand", ""))
+
+
+def is_shaped(request):
+    return requested_shape(request) != (None, {})
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying `?fields=` and `?expand=`.
+
+    The top-level serializer reads them from the request in its context and
+    hands each nested serializer the part of both trees below its field.
+    `expandable_fields` maps a field name to the serializer class and
+    keyword arguments used when the field is expanded.
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse, expand = self._requested_shape()
+        for name in expand:
+            if name in self.expandable_fields:
+                serializer_class, kwargs = self.expandable_fields[name]
+                fields[name] = serializer_class(read_only=True, **kwargs)
+        if sparse is not None:
+            fields = {name: field for name, field in fields.items() if name in sparse}
+        for name, field in fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, SparseFieldsMixin):
+                nested._shape = ((sparse or {}).get(name) or None, expand.get(name, {}))
+        return fields
+
+    def _requested_shape(self):
+        shape = getattr(self, "_shape", None)
+        if shape is not None:
+            return shape
+        root = self.root
+        if root is self or getattr(root, "child", None) is self:
+            return requested_shape(self.context.get("request"))
+        return None, {}
+
+
+def _nested(field):
+    """The serializer rendering `field` and whether it renders many objects."""
+    if isinstance(field, serializers.ListSerializer):
+        return field.child, True
+    if isinstance(field, serializers.BaseSerializer):
+        return field, False
+    return None, False
+
+
+def _fields_by_source(serializer):
+    return {
+        field.source: field
+        for field in serializer.fields.values()
+        if not field.write_only and field.source != "*" and "." not in field.source
+    }
+
+
+def related_paths(serializer, prefix=""):
+    """select_related and prefetch_related paths of the nested serializers of `serializer`."""
+    select_related, prefetch_related = [], []
+    for source, field in _fields_by_source(serializer).items():
+        nested, many = _nested(field)
+        if nested is None:
+            continue
+        path = prefix + source
+        selects, prefetches = related_paths(nested, f"{path}__")
+        if many:
+            prefetch_related += [path, *selects, *prefetches]
+        else:
+            select_related += [path, *selects]
+            prefetch_related += prefetches
+    return select_related, prefetch_related
+
+
+def renders_relation(serializer, path):
+    """
+    Whether the relation `path` of an eager-loading plan is still used by
+    `serializer`: its fields lead there, or to a non-serializer field such
+    as a StringRelatedField whose __str__ may follow it further.
+    """
+    for name in path.split("__"):
+        field = _fields_by_source(serializer).get(name)
+        if field is None:
+            return False
+        serializer, _ = _nested(field)
+        if serializer is None:
+            return True
+    return True
+
+
+def shaped_relations(serializer, select_related, prefetch_related):
+    """Eager-loading plans cut down to `serializer` and extended with its expansions."""
+    selects, prefetches = related_paths(serializer)
+    select_related = [path for path in select_related if renders_relation(serializer, path)]
+    prefetch_related = [path for path in prefetch_related if renders_relation(serializer, path)]
+    return (
+        list(dict.fromkeys(select_related + selects)),
+        list(dict.fromkeys(prefetch_related + prefetches)),
+    )
+
+
+def ordering_fields(view):
+    """Model fields the view's cursor pagination reads from each row."""
+    return [name.lstrip("-") for name in getattr(view.paginator, "ordering", None) or ()]
+
+
+def model_fields(serializer, model, annotations=(), prefix=""):
+    """
+    Columns of `model` read by `serializer`, for `.only()`, including those
+    of related models rendered by nested serializers. None when a field
+    reads something other than a model field (a method, a property).
+    """
+    names = [prefix + model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only or field.source in annotations:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        if not model_field.concrete:
+            return None
+        names.append(prefix + model_field.name)
+        nested, _ = _nested(field)
+        if nested is not None and model_field.related_model is not None:
+            # A related model nothing is listed for is loaded in full.
+            names += model_fields(nested, model_field.related_model, prefix=f"{prefix}{model_field.name}__") or []
+    return list(dict.fromkeys(names))
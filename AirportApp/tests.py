@@ -1,9 +1,44 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
 
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
-from .models import Airport, AirplaneType, Airplane, Route, Flight, Order, Ticket
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from rest_framework.request import Request
+from rest_framework.response import Response
+from django.test.utils import CaptureQueriesContext
+from Airport.database import database_settings, replica_settings
+from .models import Airport, AirplaneType, Airplane, Route, Flight, Order, Ticket, Crew, SeatHold
+from .authentication import user_cache
+from .cache import CachedResponseMixin, get_versions
+from .checks import shared_cache_check
+from .metrics import registry
+from .queryplans import full_scans
+from .routers import ReplicaRouter, read_alias
+from .middleware import PerformanceMiddleware, ReplicaRoutingMiddleware
+from .serializers import FlightListSerializer
+from .booking import BookingCoordinator, confirm_hold, hold_seats
+from .benchmarks import EndpointBenchmark, ThroughputBenchmark, compare_with_baseline, seed_dataset
+from .itinerary import search_itineraries
+from .routegraph import GRAPH_VERSION_KEY, RouteGraph
+from .seatmap import SeatMap
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
 from datetime import timedelta
@@ -38,17 +73,26 @@ class AirportAPITest(APITestCase):
 
     def test_create_order_and_tickets(self):
         url = "/api/v1/orders/"
-        data = {"flight": self.flight.id, "quantity": 3}  # Assuming your endpoint accepts quantity
+        data = {"flight_id": self.flight.id, "passenger_count": 3}
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Order.objects.count(), 1)
         self.assertEqual(Ticket.objects.count(), 3)
 
+    def test_order_needs_a_passenger(self):
+        for count in (0, -3):
+            with self.subTest(count=count):
+                response = self.client.post(
+                    "/api/v1/orders/", {"flight_id": self.flight.id, "passenger_count": count}, format="json"
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
     def test_get_flights_with_filter(self):
         url = f"/api/v1/flights/?route={self.route.id}"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_order_requires_authentication(self):
         self.client.credentials()  # Remove token
@@ -73,11 +117,12 @@ class AdditionalAPITests(APITestCase):
 
         # Setup models
         self.airport = Airport.objects.create(name="Airport X", closest_biggest_city="City X")
+        self.airport2 = Airport.objects.create(name="Airport Y", closest_biggest_city="City Y")
         self.airplane_type = AirplaneType.objects.create(name="Airbus A320")
         self.airplane = Airplane.objects.create(
             name="Plane X", rows=25, seats_in_row=6, airplane_type=self.airplane_type
         )
-        self.route = Route.objects.create(source=self.airport, destination=self.airport, distance=1000)
+        self.route = Route.objects.create(source=self.airport, destination=self.airport2, distance=1000)
         self.flight = Flight.objects.create(
             route=self.route,
             airplane=self.airplane,
@@ -93,7 +138,7 @@ class AdditionalAPITests(APITestCase):
         url = "/api/v1/tickets/"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_ticket(self):
         url = "/api/v1/tickets/"
@@ -128,3 +173,1504 @@ class AdditionalAPITests(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(AirplaneType.objects.count(), 2)
+
+
+class PaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pageuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        source = Airport.objects.create(name="Airport P1", closest_biggest_city="City P1")
+        destination = Airport.objects.create(name="Airport P2", closest_biggest_city="City P2")
+        airplane_type = AirplaneType.objects.create(name="ATR 72")
+        airplane = Airplane.objects.create(name="Plane P", rows=10, seats_in_row=4, airplane_type=airplane_type)
+        route = Route.objects.create(source=source, destination=destination, distance=300)
+        now = timezone.now()
+        self.flights = [
+            Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=now + timedelta(hours=i),
+                arrival_time=now + timedelta(hours=i + 1),
+            )
+            for i in range(7)
+        ]
+
+    def test_flights_walk_all_pages_in_departure_order(self):
+        url = "/api/v1/flights/?page_size=3"
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, [flight.id for flight in self.flights])
+
+
+class SeatMapTests(TestCase):
+    def test_find_free_skips_taken_seats_in_row_major_order(self):
+        seat_map = SeatMap(rows=3, seats_in_row=3)
+        for row, seat in [(1, 1), (1, 2), (1, 3), (2, 1)]:
+            seat_map.take(row, seat)
+        self.assertEqual(seat_map.find_free(3), [(2, 2), (2, 3), (3, 1)])
+        self.assertEqual(seat_map.free_count(), 5)
+
+    def test_find_free_stops_at_airplane_size(self):
+        seat_map = SeatMap(rows=1, seats_in_row=3)
+        self.assertEqual(seat_map.find_free(10), [(1, 1), (1, 2), (1, 3)])
+
+    def test_release_and_round_trip(self):
+        seat_map = SeatMap(rows=2, seats_in_row=5)
+        seat_map.take(2, 5)
+        restored = SeatMap(2, 5, seat_map.to_bytes())
+        self.assertTrue(restored.is_taken(2, 5))
+        restored.release(2, 5)
+        self.assertFalse(restored.is_taken(2, 5))
+
+    def test_out_of_range_seat_raises(self):
+        seat_map = SeatMap(rows=2, seats_in_row=2)
+        with self.assertRaises(ValueError):
+            seat_map.take(3, 1)
+
+    def test_migration_stores_seat_maps_of_existing_flights(self):
+        fill_seat_maps = import_module("AirportApp.migrations.0002_flight_seat_map").fill_seat_maps
+        airport = Airport.objects.create(name="Airport S", closest_biggest_city="City S")
+        other = Airport.objects.create(name="Airport T", closest_biggest_city="City T")
+        airplane_type = AirplaneType.objects.create(name="ATR 72")
+        airplane = Airplane.objects.create(name="UR-MAP", rows=2, seats_in_row=2, airplane_type=airplane_type)
+        now = timezone.now()
+        flight = Flight.objects.create(
+            route=Route.objects.create(source=airport, destination=other, distance=100), airplane=airplane,
+            departure_time=now + timedelta(days=1), arrival_time=now + timedelta(days=1, hours=1),
+        )
+        Ticket.objects.create(row=2, seat=1, flight=flight, order=Order.objects.create(
+            user=User.objects.create_user(username="mapuser", password="testpass")
+        ))
+        Flight.objects.filter(pk=flight.pk).update(seat_map=None)
+        fill_seat_maps(django_apps, None)
+        flight.refresh_from_db()
+        self.assertEqual(SeatMap(2, 2, bytes(flight.seat_map)).occupied(), [(2, 1)])
+
+
+class RouteGraphTests(TestCase):
+    def setUp(self):
+        # 1 -> 2 -> 3 -> 4 is short but takes three legs; 1 -> 4 direct is long.
+        self.graph = RouteGraph([
+            (10, 1, 2, 100),
+            (11, 2, 3, 100),
+            (12, 3, 4, 100),
+            (13, 1, 4, 1000),
+            (14, 1, 3, 500),
+        ])
+
+    def test_shortest_path_by_distance(self):
+        self.assertEqual(self.graph.shortest_path(1, 4), (300, [10, 11, 12]))
+
+    def test_max_legs_limits_path(self):
+        self.assertEqual(self.graph.shortest_path(1, 4, max_legs=2), (600, [14, 12]))
+        self.assertEqual(self.graph.shortest_path(1, 4, max_legs=1), (1000, [13]))
+
+    def test_routes_are_directed(self):
+        self.assertIsNone(self.graph.shortest_path(4, 1))
+
+
+class RoutePathAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pathuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        self.lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        self.odesa = Airport.objects.create(name="Odesa Intl", closest_biggest_city="Odesa")
+        Route.objects.create(source=self.kyiv, destination=self.lviv, distance=540)
+        Route.objects.create(source=self.lviv, destination=self.odesa, distance=620)
+
+    def test_path_through_connection(self):
+        response = self.client.get(f"/api/v1/routes/path/?from={self.kyiv.id}&to={self.odesa.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["distance"], 1160)
+        self.assertEqual(len(response.data["legs"]), 2)
+        self.assertEqual(response.data["legs"][0]["source"], str(self.kyiv))
+
+    def test_new_route_invalidates_graph(self):
+        url = f"/api/v1/routes/path/?from={self.kyiv.id}&to={self.odesa.id}"
+        self.client.get(url)
+        Route.objects.create(source=self.kyiv, destination=self.odesa, distance=480)
+        response = self.client.get(url)
+        self.assertEqual(response.data["distance"], 480)
+
+    def test_graph_follows_shared_version(self):
+        url = f"/api/v1/routes/path/?from={self.kyiv.id}&to={self.odesa.id}"
+        self.assertEqual(self.client.get(url).data["distance"], 1160)
+        # Another process adds a route: no signal runs here, only the shared version changes.
+        Route.objects.bulk_create([Route(source=self.kyiv, destination=self.odesa, distance=480)])
+        cache.set(GRAPH_VERSION_KEY, "from-another-process", timeout=None)
+        self.assertEqual(self.client.get(url).data["distance"], 480)
+
+    def test_route_deleted_behind_graph(self):
+        url = f"/api/v1/routes/path/?from={self.kyiv.id}&to={self.odesa.id}"
+        direct = Route.objects.create(source=self.kyiv, destination=self.odesa, distance=480)
+        self.assertEqual(self.client.get(url).data["distance"], 480)
+        # As if another process deleted it: no signal reaches this graph.
+        Route.objects.filter(pk=direct.pk)._raw_delete(Route.objects.db)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["distance"], 1160)
+        Route.objects.filter(source=self.lviv)._raw_delete(Route.objects.db)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unreachable_and_invalid_queries(self):
+        response = self.client.get(f"/api/v1/routes/path/?from={self.odesa.id}&to={self.kyiv.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/api/v1/routes/path/?from={self.kyiv.id}&to={self.odesa.id}&max_legs=1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/api/v1/routes/path/?from={self.kyiv.id}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ItinerarySearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tripuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        self.lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        self.odesa = Airport.objects.create(name="Odesa Intl", closest_biggest_city="Odesa")
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        self.airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        self.kyiv_lviv = Route.objects.create(source=self.kyiv, destination=self.lviv, distance=540)
+        self.lviv_odesa = Route.objects.create(source=self.lviv, destination=self.odesa, distance=620)
+        self.kyiv_odesa = Route.objects.create(source=self.kyiv, destination=self.odesa, distance=480)
+        self.start = (timezone.now() + timedelta(days=7)).replace(hour=6, minute=0, second=0, microsecond=0)
+
+    def fly(self, route, departs_in, duration):
+        departure = self.start + departs_in
+        return Flight.objects.create(
+            route=route, airplane=self.airplane, departure_time=departure, arrival_time=departure + duration
+        )
+
+    def search(self, **params):
+        params.setdefault("from", self.kyiv.id)
+        params.setdefault("to", self.odesa.id)
+        params.setdefault("departure_after", self.start.isoformat())
+        return self.client.get("/api/v1/flights/itineraries/", params)
+
+    def test_connections_respect_minimum_connection_time(self):
+        first = self.fly(self.kyiv_lviv, timedelta(hours=1), timedelta(hours=1))
+        self.fly(self.lviv_odesa, timedelta(hours=2, minutes=15), timedelta(hours=1))
+        second = self.fly(self.lviv_odesa, timedelta(hours=3), timedelta(hours=1))
+        response = self.search()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual([f["id"] for f in response.data[0]["flights"]], [first.id, second.id])
+        self.assertEqual(response.data[0]["duration_minutes"], 180)
+        self.assertEqual(response.data[0]["distance"], 1160)
+
+    def test_flight_deleted_after_search_is_left_out(self):
+        direct = self.fly(self.kyiv_odesa, timedelta(hours=1), timedelta(hours=3))
+        later = self.fly(self.kyiv_odesa, timedelta(hours=2), timedelta(hours=3))
+
+        def search_then_delete(*args, **kwargs):
+            found = search_itineraries(*args, **kwargs)
+            direct.delete()
+            return found
+
+        with mock.patch("AirportApp.views.search_itineraries", search_then_delete):
+            response = self.search()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([[f["id"] for f in row["flights"]] for row in response.data], [[later.id]])
+
+    def test_sorted_by_time_or_distance(self):
+        direct = self.fly(self.kyiv_odesa, timedelta(hours=8), timedelta(hours=3))
+        first = self.fly(self.kyiv_lviv, timedelta(hours=1), timedelta(hours=1))
+        second = self.fly(self.lviv_odesa, timedelta(hours=3), timedelta(hours=1))
+        by_time = self.search()
+        self.assertEqual([f["id"] for f in by_time.data[0]["flights"]], [direct.id])
+        self.assertEqual([f["id"] for f in by_time.data[1]["flights"]], [first.id, second.id])
+        by_distance = self.search(sort="distance", limit=1)
+        self.assertEqual(len(by_distance.data), 1)
+        self.assertEqual(by_distance.data[0]["distance"], 480)
+
+    def test_window_and_leg_limits(self):
+        self.fly(self.kyiv_lviv, timedelta(hours=1), timedelta(hours=1))
+        self.fly(self.lviv_odesa, timedelta(hours=3), timedelta(hours=1))
+        self.fly(self.kyiv_odesa, timedelta(days=3), timedelta(hours=1))
+        self.assertEqual(self.search(max_legs=1).data, [])
+        self.assertEqual(len(self.search().data), 1)
+
+    def test_search_runs_fixed_number_of_queries(self):
+        for day in range(5):
+            self.fly(self.kyiv_lviv, timedelta(hours=day), timedelta(hours=1))
+            self.fly(self.lviv_odesa, timedelta(hours=day + 2), timedelta(hours=1))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.search(limit=10)
+        self.assertGreater(len(response.data), 5)
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_invalid_query(self):
+        response = self.client.get("/api/v1/flights/itineraries/", {"to": self.odesa.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("from", response.data)
+
+
+class FlightSeatMapAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="seatuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        source = Airport.objects.create(name="Airport S1", closest_biggest_city="City S1")
+        destination = Airport.objects.create(name="Airport S2", closest_biggest_city="City S2")
+        airplane_type = AirplaneType.objects.create(name="Dash 8")
+        airplane = Airplane.objects.create(name="Plane S", rows=2, seats_in_row=2, airplane_type=airplane_type)
+        route = Route.objects.create(source=source, destination=destination, distance=300)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=1),
+        )
+
+    def book(self, count):
+        return self.client.post(
+            "/api/v1/orders/", {"flight_id": self.flight.id, "passenger_count": count}, format="json"
+        )
+
+    def test_booking_updates_stored_seat_map(self):
+        self.assertEqual(self.book(3).status_code, status.HTTP_201_CREATED)
+        self.flight.refresh_from_db()
+        seat_map = SeatMap(2, 2, bytes(self.flight.seat_map))
+        self.assertEqual(seat_map.find_free(4), [(2, 2)])
+        self.assertEqual(self.book(2).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_seats_endpoint_does_not_read_tickets(self):
+        self.book(1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/v1/flights/{self.flight.id}/seats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["available"], 3)
+        self.assertEqual(response.data["seats"], [[True, False], [False, False]])
+        self.assertFalse(any('"AirportApp_ticket"' in q["sql"] for q in ctx.captured_queries))
+
+    def test_ticket_delete_releases_seat(self):
+        self.book(4)
+        Ticket.objects.get(flight=self.flight, row=1, seat=2).delete()
+        response = self.book(1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Ticket.objects.filter(order_id=response.data["id"], row=1, seat=2).exists())
+
+    def test_seat_counters_follow_bookings_and_deletes(self):
+        self.assertEqual(self.flight.seats_available, 4)
+        self.book(3)
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (3, 1))
+        Ticket.objects.filter(flight=self.flight).first().delete()
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (2, 2))
+
+    def test_flight_edit_keeps_seats_booked_since_load(self):
+        stale = Flight.objects.get(pk=self.flight.pk)
+        self.book(3)
+        stale.departure_time += timedelta(hours=1)
+        stale.arrival_time += timedelta(hours=1)
+        stale.save()
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (3, 1))
+        self.assertEqual(self.book(2).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_airplane_change_refits_seat_map(self):
+        self.book(3)
+        bigger = Airplane.objects.create(
+            name="Plane L", rows=3, seats_in_row=2, airplane_type=self.flight.airplane.airplane_type
+        )
+        response = self.client.patch(f"/api/v1/flights/{self.flight.id}/", {"airplane": bigger.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (3, 3))
+        seat_map = SeatMap(3, 2, bytes(self.flight.seat_map))
+        self.assertEqual(seat_map.occupied(), sorted(Ticket.objects.filter(flight=self.flight).values_list("row", "seat")))
+
+    def test_availability_filter(self):
+        self.book(4)
+        response = self.client.get("/api/v1/flights/?has_seats=true")
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get("/api/v1/flights/?has_seats=false")
+        self.assertEqual(response.data["results"][0]["seats_available"], 0)
+        Ticket.objects.filter(flight=self.flight).first().delete()
+        response = self.client.get("/api/v1/flights/?has_seats=true&min_seats=2")
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get("/api/v1/flights/?has_seats=true&min_seats=1")
+        self.assertEqual([f["id"] for f in response.data["results"]], [self.flight.id])
+
+    def test_seat_map_rebuilt_from_existing_tickets(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=1, flight=self.flight, order=order)
+        Flight.objects.filter(pk=self.flight.pk).update(seat_map=None)
+        response = self.client.get(f"/api/v1/flights/{self.flight.id}/seats/")
+        self.assertEqual(response.data["available"], 3)
+
+
+class BulkOrderTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="bulkuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        kyiv = Airport.objects.create(name="Airport B1", closest_biggest_city="City B1")
+        lviv = Airport.objects.create(name="Airport B2", closest_biggest_city="City B2")
+        airplane_type = AirplaneType.objects.create(name="Airbus A321")
+        airplane = Airplane.objects.create(name="Plane B", rows=2, seats_in_row=2, airplane_type=airplane_type)
+        outbound = Route.objects.create(source=kyiv, destination=lviv, distance=540)
+        inbound = Route.objects.create(source=lviv, destination=kyiv, distance=540)
+        now = timezone.now()
+        self.outbound = Flight.objects.create(
+            route=outbound, airplane=airplane,
+            departure_time=now + timedelta(days=1), arrival_time=now + timedelta(days=1, hours=1),
+        )
+        self.inbound = Flight.objects.create(
+            route=inbound, airplane=airplane,
+            departure_time=now + timedelta(days=3), arrival_time=now + timedelta(days=3, hours=1),
+        )
+
+    def test_round_trip_booked_in_one_order(self):
+        data = {"legs": [
+            {"flight_id": self.outbound.id, "passenger_count": 3},
+            {"flight_id": self.inbound.id, "passenger_count": 3},
+        ]}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/v1/orders/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["tickets"]), 6)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Ticket.objects.filter(flight=self.inbound).count(), 3)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "AirportApp_ticket"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_failing_leg_books_nothing(self):
+        data = {"legs": [
+            {"flight_id": self.outbound.id, "passenger_count": 2},
+            {"flight_id": self.inbound.id, "passenger_count": 5},
+        ]}
+        response = self.client.post("/api/v1/orders/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(Ticket.objects.count(), 0)
+        seats = self.client.get(f"/api/v1/flights/{self.outbound.id}/seats/")
+        self.assertEqual(seats.data["available"], 4)
+
+    def test_empty_legs_rejected(self):
+        response = self.client.post("/api/v1/orders/bulk/", {"legs": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeatHoldTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="holduser", password="testpass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        source = Airport.objects.create(name="Airport H1", closest_biggest_city="City H1")
+        destination = Airport.objects.create(name="Airport H2", closest_biggest_city="City H2")
+        route = Route.objects.create(source=source, destination=destination, distance=400)
+        airplane_type = AirplaneType.objects.create(name="Dash 8")
+        airplane = Airplane.objects.create(name="UR-HLD", rows=2, seats_in_row=3, airplane_type=airplane_type)
+        now = timezone.now()
+        self.flight = Flight.objects.create(
+            route=route, airplane=airplane,
+            departure_time=now + timedelta(days=1), arrival_time=now + timedelta(days=1, hours=1),
+        )
+
+    def hold(self, count):
+        return self.client.post("/api/v1/holds/", {"flight_id": self.flight.id, "passenger_count": count}, format="json")
+
+    def expire(self, hold_id):
+        SeatHold.objects.filter(pk=hold_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_held_seats_are_not_sold_to_others(self):
+        response = self.hold(4)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["seats"], [[1, 1], [1, 2], [1, 3], [2, 1]])
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (0, 2))
+        order = self.client.post("/api/v1/orders/", {"flight_id": self.flight.id, "passenger_count": 2}, format="json")
+        self.assertEqual(sorted((t.row, t.seat) for t in Ticket.objects.filter(order_id=order.data["id"])), [(2, 2), (2, 3)])
+        self.assertEqual(self.hold(1).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_converts_hold_into_order(self):
+        hold_id = self.hold(2).data["id"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/api/v1/holds/{hold_id}/confirm/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([(t["row"], t["seat"]) for t in response.data["tickets"]], [(1, 1), (1, 2)])
+        self.assertFalse(any("seat_map" in query["sql"] and "UPDATE" in query["sql"] for query in ctx.captured_queries))
+        self.assertFalse(SeatHold.objects.exists())
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (2, 4))
+        self.assertEqual(self.client.post(f"/api/v1/holds/{hold_id}/confirm/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        hold_id = self.hold(6).data["id"]
+        self.expire(hold_id)
+        response = self.client.post(f"/api/v1/holds/{hold_id}/confirm/")
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (0, 6))
+
+    def test_release_and_sweep(self):
+        first = self.hold(2).data["id"]
+        second = self.hold(2).data["id"]
+        self.assertEqual(self.client.delete(f"/api/v1/holds/{first}/").status_code, status.HTTP_204_NO_CONTENT)
+        self.expire(second)
+        self.assertEqual(self.client.get("/api/v1/holds/").data, [])
+        out = io.StringIO()
+        call_command("sweep_seat_holds", stdout=out)
+        self.assertIn("Released 1 expired seat holds", out.getvalue())
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (0, 6))
+
+    def test_expired_holds_are_released_by_new_holds(self):
+        self.expire(self.hold(6).data["id"])
+        self.assertEqual(self.hold(6).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+    def test_orders_take_seats_of_expired_holds(self):
+        for window in (0, 5):
+            with self.subTest(window=window), override_settings(BOOKING_GROUP_COMMIT_WINDOW_MS=window):
+                Ticket.objects.all().delete()
+                self.expire(self.hold(6).data["id"])
+                response = self.client.post(
+                    "/api/v1/orders/", {"flight_id": self.flight.id, "passenger_count": 2}, format="json"
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertFalse(SeatHold.objects.exists())
+                self.flight.refresh_from_db()
+                self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (2, 4))
+
+    def test_tickets_cannot_take_held_seats(self):
+        holder = User.objects.create_user(username="holder", password="testpass")
+        hold = hold_seats(holder, self.flight.id, 2)
+        order = Order.objects.create(user=self.user)
+        response = self.client.post(
+            "/api/v1/tickets/", {"flight": self.flight.id, "order": order.id, "row": 1, "seat": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", response.data)
+        ticket = self.client.post(
+            "/api/v1/tickets/", {"flight": self.flight.id, "order": order.id, "row": 2, "seat": 1}, format="json"
+        )
+        self.assertEqual(ticket.status_code, status.HTTP_201_CREATED)
+        moved = self.client.patch(f"/api/v1/tickets/{ticket.data['id']}/", {"seat": 2, "row": 1}, format="json")
+        self.assertEqual(moved.status_code, status.HTTP_400_BAD_REQUEST)
+
+        confirmed = confirm_hold(holder, hold.pk)
+        self.assertEqual(sorted(confirmed.ticket_set.values_list("row", "seat")), [(1, 1), (1, 2)])
+        self.flight.refresh_from_db()
+        self.assertEqual((self.flight.seats_sold, self.flight.seats_available), (3, 3))
+
+    def test_rebuilt_seat_map_keeps_holds(self):
+        self.hold(3)
+        Flight.objects.filter(pk=self.flight.pk).update(seat_map=None)
+        self.flight.refresh_from_db()
+        self.assertEqual(SeatMap.for_flight(self.flight).free_count(), 3)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    orders = 300
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rushuser", password="testpass")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        source = Airport.objects.create(name="Airport C1", closest_biggest_city="City C1")
+        destination = Airport.objects.create(name="Airport C2", closest_biggest_city="City C2")
+        airplane_type = AirplaneType.objects.create(name="Boeing 787")
+        self.airplane = Airplane.objects.create(
+            name="Plane C", rows=40, seats_in_row=6, airplane_type=airplane_type
+        )
+        route = Route.objects.create(source=source, destination=destination, distance=900)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=self.airplane,
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=3),
+        )
+
+    def place_order(self, _):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        try:
+            response = client.post(
+                "/api/v1/orders/", {"flight_id": self.flight.id, "passenger_count": 1}, format="json"
+            )
+            return response.status_code
+        finally:
+            connection.close()
+
+    def test_simultaneous_orders_never_oversell(self):
+        capacity = self.airplane.rows * self.airplane.seats_in_row
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            codes = list(pool.map(self.place_order, range(self.orders)))
+
+        self.assertNotIn(status.HTTP_500_INTERNAL_SERVER_ERROR, codes)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), capacity)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), self.orders - capacity)
+        seats = list(Ticket.objects.filter(flight=self.flight).values_list("row", "seat"))
+        self.assertEqual(len(seats), capacity)
+        self.assertEqual(len(set(seats)), capacity)
+
+
+class GroupCommitBookingTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="flashuser", password="testpass")
+        source = Airport.objects.create(name="Airport G1", closest_biggest_city="City G1")
+        destination = Airport.objects.create(name="Airport G2", closest_biggest_city="City G2")
+        airplane_type = AirplaneType.objects.create(name="Airbus A319")
+        airplane = Airplane.objects.create(name="Plane G", rows=2, seats_in_row=5, airplane_type=airplane_type)
+        route = Route.objects.create(source=source, destination=destination, distance=700)
+        self.flight = Flight.objects.create(
+            route=route, airplane=airplane,
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=2),
+        )
+
+    def test_concurrent_bookings_share_one_transaction(self):
+        coordinator = BookingCoordinator()
+
+        def book(_):
+            try:
+                return coordinator.book(self.user, self.flight.id, 2, window=0.5)
+            except ValidationError as error:
+                return error
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(book, range(8)))
+
+        self.assertEqual(coordinator.batches, 1)
+        orders = [result for result in results if isinstance(result, Order)]
+        self.assertEqual(len(orders), 5)
+        self.assertEqual(len(results) - len(orders), 3)
+        seats = list(Ticket.objects.filter(flight=self.flight).values_list("row", "seat"))
+        self.assertEqual(len(set(seats)), 10)
+        self.assertEqual(
+            sorted(Ticket.objects.values_list("order_id", flat=True).distinct()), sorted(o.id for o in orders)
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+
+    def test_full_batch_commits_without_waiting(self):
+        coordinator = BookingCoordinator(max_batch=1)
+        order = coordinator.book(self.user, self.flight.id, 1, window=60)
+        self.assertEqual(order.ticket_set.count(), 1)
+
+
+class UserScopedOrderTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        source = Airport.objects.create(name="Airport S", closest_biggest_city="City S")
+        destination = Airport.objects.create(name="Airport D", closest_biggest_city="City D")
+        route = Route.objects.create(source=source, destination=destination, distance=300)
+        airplane_type = AirplaneType.objects.create(name="ATR 72")
+        airplane = Airplane.objects.create(name="UR-SCP", rows=10, seats_in_row=4, airplane_type=airplane_type)
+        now = timezone.now()
+        self.past = Flight.objects.create(
+            route=route, airplane=airplane,
+            departure_time=now - timedelta(days=2), arrival_time=now - timedelta(days=2) + timedelta(hours=1),
+        )
+        self.soon = Flight.objects.create(
+            route=route, airplane=airplane,
+            departure_time=now + timedelta(days=1), arrival_time=now + timedelta(days=1, hours=1),
+        )
+        self.later = Flight.objects.create(
+            route=route, airplane=airplane,
+            departure_time=now + timedelta(days=5), arrival_time=now + timedelta(days=5, hours=1),
+        )
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=1, flight=self.past, order=self.order)
+        Ticket.objects.create(row=1, seat=1, flight=self.later, order=self.order)
+        Ticket.objects.create(row=1, seat=2, flight=self.later, order=self.order)
+        self.empty_order = Order.objects.create(user=self.user)
+        self.foreign_order = Order.objects.create(user=self.other)
+        self.foreign_ticket = Ticket.objects.create(row=2, seat=1, flight=self.soon, order=self.foreign_order)
+
+    def test_orders_and_tickets_are_scoped_to_user(self):
+        orders = self.client.get("/api/v1/orders/").data["results"]
+        self.assertEqual({order["id"] for order in orders}, {self.order.id, self.empty_order.id})
+        tickets = self.client.get("/api/v1/tickets/").data["results"]
+        self.assertEqual(len(tickets), 3)
+        self.assertEqual(
+            self.client.get(f"/api/v1/orders/{self.foreign_order.id}/").status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.client.get(f"/api/v1/tickets/{self.foreign_ticket.id}/").status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_ticket_cannot_join_foreign_order(self):
+        data = {"row": 3, "seat": 1, "flight": self.soon.id, "order": self.foreign_order.id}
+        response = self.client.post("/api/v1/tickets/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mine_is_one_annotated_query(self):
+        with self.assertNumQueries(2):  # the user, then the orders
+            response = self.client.get("/api/v1/orders/mine/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summaries = {order["id"]: order for order in response.data["results"]}
+        self.assertEqual(set(summaries), {self.order.id, self.empty_order.id})
+        summary = summaries[self.order.id]
+        self.assertEqual(summary["ticket_count"], 3)
+        self.assertEqual(summary["flights"], [self.past.id, self.later.id])
+        self.assertEqual(
+            summary["next_departure"], FlightListSerializer(self.later).data["departure_time"]
+        )
+        self.assertEqual(summaries[self.empty_order.id]["ticket_count"], 0)
+        self.assertEqual(summaries[self.empty_order.id]["flights"], [])
+        self.assertIsNone(summaries[self.empty_order.id]["next_departure"])
+
+
+class ReferenceDataCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cacheuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        self.lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        self.route = Route.objects.create(source=self.kyiv, destination=self.lviv, distance=540)
+
+    def test_repeated_list_served_from_cache(self):
+        first = self.client.get("/api/v1/airports/?closest_biggest_city=Kyiv")
+        self.assertIn("ETag", first)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/v1/airports/?closest_biggest_city=Kyiv")
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertFalse(any('"AirportApp_airport"' in q["sql"] for q in ctx.captured_queries))
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get("/api/v1/routes/")["ETag"]
+        response = self.client.get("/api/v1/routes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_related_model_change_invalidates(self):
+        etag = self.client.get(f"/api/v1/routes/{self.route.id}/")["ETag"]
+        self.client.patch(f"/api/v1/airports/{self.kyiv.id}/", {"closest_biggest_city": "Kyiv Oblast"}, format="json")
+        response = self.client.get(f"/api/v1/routes/{self.route.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["source"]["closest_biggest_city"], "Kyiv Oblast")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_query_string_order_does_not_matter(self):
+        self.client.get(f"/api/v1/routes/?source={self.kyiv.id}&destination={self.lviv.id}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/v1/routes/?destination={self.lviv.id}&source={self.kyiv.id}")
+        self.assertEqual(len(response.data), 1)
+        self.assertFalse(any('"AirportApp_route"' in q["sql"] for q in ctx.captured_queries))
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([warning.id for warning in shared_cache_check(None)], ["AirportApp.W001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class FastListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="fastuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        airplane_type = AirplaneType.objects.create(name='Boeing "737" MAX')
+        airplane = Airplane.objects.create(name="UR-ÄÖ", rows=10, seats_in_row=4, airplane_type=airplane_type)
+        kyiv = Airport.objects.create(name="Київ Бориспіль", closest_biggest_city="Kyiv")
+        lviv = Airport.objects.create(name="Lviv (LWO)", closest_biggest_city="Lviv")
+        route = Route.objects.create(source=kyiv, destination=lviv, distance=540)
+        Route.objects.create(source=lviv, destination=kyiv, distance=541)
+        departure = timezone.now().replace(microsecond=123456) + timedelta(days=1)
+        for i in range(3):
+            Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=departure + timedelta(hours=i),
+                arrival_time=departure + timedelta(hours=i, minutes=75),
+            )
+
+    def get_content(self, url):
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content
+
+    def test_fast_list_matches_serializer_output(self):
+        for url in ("/api/v1/flights/", "/api/v1/flights/?page_size=2", "/api/v1/routes/"):
+            with self.subTest(url=url):
+                fast = self.get_content(url)
+                with override_settings(API_FAST_LIST=False):
+                    slow = self.get_content(url)
+                self.assertEqual(fast, slow)
+
+    def test_fast_list_uses_single_query(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/v1/routes/")
+        self.assertEqual(len([q for q in ctx.captured_queries if '"AirportApp_' in q["sql"]]), 1)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="exportuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        route = Route.objects.create(source=kyiv, destination=lviv, distance=540)
+        departure = timezone.now() + timedelta(days=1)
+        self.flights = [
+            Flight.objects.create(
+                route=route, airplane=airplane,
+                departure_time=departure + timedelta(hours=i), arrival_time=departure + timedelta(hours=i + 1),
+            )
+            for i in range(2)
+        ]
+        order = Order.objects.create(user=self.user)
+        for seat in range(1, 4):
+            Ticket.objects.create(row=1, seat=seat, flight=self.flights[0], order=order)
+        Ticket.objects.create(row=1, seat=1, flight=self.flights[1], order=order)
+
+    def test_ticket_ndjson_export_with_filter(self):
+        response = self.client.get(f"/api/v1/tickets/export/?format=ndjson&flight={self.flights[0].id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["seat"] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0]["username"], "exportuser")
+        self.assertEqual(rows[0]["route"], str(self.flights[0].route))
+
+    def test_flight_csv_export(self):
+        response = self.client.get("/api/v1/flights/export/?format=csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        reader = csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode()))
+        rows = list(reader)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["airplane"], "UR-AAA (Boeing 737)")
+        self.assertEqual(rows[0]["seats_sold"], "3")
+
+    def test_ndjson_is_the_default_format(self):
+        for headers in ({}, {"HTTP_ACCEPT": "*/*"}):
+            with self.subTest(headers=headers):
+                response = self.client.get("/api/v1/flights/export/", **headers)
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 2)
+        self.assertEqual(self.client.get("/api/v1/flights/export/?format=json").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_streamed_rows_keep_the_request_database(self):
+        response = self.client.get("/api/v1/tickets/export/")
+        # Streaming happens after the routing middleware has returned.
+        token = read_alias.set("replica1")
+        try:
+            lines = b"".join(response.streaming_content).splitlines()
+        finally:
+            read_alias.reset(token)
+        self.assertEqual(len(lines), 4)
+
+    def test_order_export_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.get("/api/v1/orders/export/?format=csv")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ImportScheduleTests(TestCase):
+    def setUp(self):
+        self.kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        self.lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        self.airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        Route.objects.create(source=self.kyiv, destination=self.lviv, distance=540)
+        self.pilot = Crew.objects.create(first_name="Olena", second_name="Pilot")
+
+    def run_import(self, content, suffix):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8") as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_schedule", handle.name, "--batch-size", "2", stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_reports_bad_lines_and_keeps_good_ones(self):
+        content = (
+            "source,destination,distance,airplane,departure_time,arrival_time,crew\n"
+            "Kyiv Boryspil,Lviv Danylo Halytskyi,,UR-AAA,2030-01-01T08:00,2030-01-01T09:00,Olena Pilot\n"
+            "Lviv Danylo Halytskyi,Kyiv Boryspil,540,UR-AAA,2030-01-01T12:00,2030-01-01T13:00,\n"
+            "Kyiv Boryspil,Lviv Danylo Halytskyi,,UR-AAA,2030-01-02T08:00,2030-01-02T07:00,\n"
+            "Kyiv Boryspil,Nowhere,,UR-AAA,2030-01-02T08:00,2030-01-02T09:00,\n"
+            "Lviv Danylo Halytskyi,Kyiv Boryspil,,UR-ZZZ,2030-01-03T08:00,2030-01-03T09:00,\n"
+            "Lviv Danylo Halytskyi,Kyiv Boryspil,,UR-AAA,2030-01-04T08:00,2030-01-04T09:00,Olena Pilot\n"
+        )
+        out, err = self.run_import(content, ".csv")
+        self.assertIn("Imported 3 flights (1 new routes), 3 lines with errors.", out)
+        self.assertIn("line 4: arrival_time must be after departure_time", err)
+        self.assertIn("line 5: unknown airport 'Nowhere'", err)
+        self.assertIn("line 6: unknown airplane 'UR-ZZZ'", err)
+        self.assertEqual(Flight.objects.count(), 3)
+        self.assertEqual(Route.objects.get(source=self.lviv).distance, 540)
+        self.assertEqual(self.pilot.flights.count(), 2)
+        self.assertEqual(Flight.objects.first().seats_available, 120)
+
+    def test_ndjson_import_validates_new_route_distance(self):
+        content = "\n".join(json.dumps(record) for record in [
+            {"source": "Lviv Danylo Halytskyi", "destination": "Kyiv Boryspil", "distance": 0,
+             "airplane": "UR-AAA", "departure_time": "2030-01-01T08:00Z", "arrival_time": "2030-01-01T09:00Z"},
+            {"source": "Kyiv Boryspil", "destination": "Lviv Danylo Halytskyi", "airplane": "UR-AAA",
+             "departure_time": "2030-01-01T08:00Z", "arrival_time": "2030-01-01T09:00Z",
+             "crew": ["Olena Pilot", "Nobody Here"]},
+        ])
+        out, err = self.run_import(content, ".ndjson")
+        self.assertIn("line 1: distance must be greater than zero", err)
+        self.assertIn("line 2: unknown crew member 'Nobody Here'", err)
+        self.assertEqual(Flight.objects.count(), 0)
+
+
+def seed_small_dataset(seed):
+    call_command(
+        "seed", "--airports", "6", "--routes", "12", "--airplanes", "3", "--flights", "40",
+        "--fill-factor", "0.25", "--seed", str(seed), "--start", "2030-01-01", "--batch-size", "15",
+        stdout=io.StringIO(),
+    )
+
+
+class SeedCommandTests(TestCase):
+    def seed(self, seed):
+        seed_small_dataset(seed)
+        return (
+            list(Route.objects.order_by("source__name", "destination__name").values_list(
+                "source__name", "destination__name", "distance"
+            )),
+            list(Flight.objects.order_by("departure_time", "route__distance", "seats_sold").values_list(
+                "route__source__name", "departure_time", "arrival_time", "seats_sold"
+            )),
+            Ticket.objects.count(),
+        )
+
+    def test_invalidates_shared_versions(self):
+        cache.set(GRAPH_VERSION_KEY, "before-seed", timeout=None)
+        routes_version = get_versions([Route])
+        self.seed(7)
+        self.assertNotEqual(cache.get(GRAPH_VERSION_KEY), "before-seed")
+        self.assertNotEqual(get_versions([Route]), routes_version)
+
+    def test_same_seed_rebuilds_same_dataset(self):
+        first = self.seed(7)
+        self.assertEqual(self.seed(7), first)
+        self.assertNotEqual(self.seed(8), first)
+
+    def test_default_start_is_fixed(self):
+        departures = []
+        for start in ((), ("--start", "2030-01-01")):
+            call_command("seed", "--flights", "20", "--seed", "7", *start, stdout=io.StringIO())
+            departures.append(list(Flight.objects.order_by("departure_time").values_list("departure_time", flat=True)))
+        self.assertEqual(departures[0], departures[1])
+
+    def test_sizes_and_seat_state(self):
+        routes, flights, tickets = self.seed(7)
+        self.assertEqual(len(routes), 12)
+        self.assertEqual(len(flights), 40)
+        self.assertEqual(tickets, sum(flight[3] for flight in flights))
+        flight = Flight.objects.select_related("airplane").first()
+        seat_map = SeatMap.for_flight(flight)
+        self.assertEqual(seat_map.occupied_count(), flight.seats_sold)
+        self.assertEqual(
+            set(Ticket.objects.filter(flight=flight).values_list("row", "seat")),
+            {(r, s) for r, row in enumerate(seat_map.as_rows(), 1) for s, taken in enumerate(row, 1) if taken},
+        )
+
+
+
+
+class ReseedTests(TransactionTestCase):
+    """Runs in autocommit, where every raw delete is checked against foreign keys at once."""
+
+    def test_reseed_with_open_holds(self):
+        seed_small_dataset(7)
+        hold_seats(User.objects.get(username="user1"), Flight.objects.first().id, 2)
+        seed_small_dataset(7)
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(Flight.objects.count(), 40)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_every_endpoint_is_measured(self):
+        seed_dataset(300)
+        results = EndpointBenchmark(repeat=2).run()
+        self.assertIn("list tickets", results)
+        self.assertIn("create order", results)
+        for result in results.values():
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries"], 0)
+
+    def test_compare_with_baseline(self):
+        baseline = {"1000": {"list flights": {"p95_ms": 10.0, "queries": 2}}}
+        same = {"1000": {"list flights": {"p95_ms": 12.0, "queries": 2}}}
+        self.assertEqual(compare_with_baseline(same, baseline, tolerance=0.25), [])
+        slower = {"1000": {"list flights": {"p95_ms": 13.0, "queries": 3}}}
+        self.assertEqual(len(compare_with_baseline(slower, baseline, tolerance=0.25)), 2)
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.user = User.objects.create_user(username="perfuser", password="testpass")
+        self.staff = User.objects.create_user(username="perfstaff", password="testpass", is_staff=True)
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        Airport.objects.create(name="Airport M", closest_biggest_city="City M")
+        Order.objects.create(user=self.user)
+
+    def read_metrics(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        return client.get("/metrics").content.decode()
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get("/api/v1/orders/")
+        timing = response["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn("serializer;dur=", timing)
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_server_timing_is_opt_in(self):
+        response = self.client.get("/api/v1/orders/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertIn("http_request_duration_seconds_count{", self.read_metrics())
+
+    def test_metrics_endpoint_aggregates_per_route(self):
+        self.client.get("/api/v1/orders/")
+        self.client.get("/api/v1/orders/")
+        body = self.read_metrics()
+        labels = 'method="GET",route="api:order-list",status="200"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'http_request_db_queries_total{{{labels}}}', body)
+        self.assertNotIn('route="metrics"', body)
+        serializer_seconds = body.split(f"http_request_serializer_seconds_total{{{labels}}} ")[1].split()[0]
+        self.assertGreater(float(serializer_seconds), 0)
+
+    @override_settings(PERF_SAMPLE_RATE=0, PERF_SERVER_TIMING=True)
+    def test_sampling_switch(self):
+        response = self.client.get("/api/v1/orders/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self.read_metrics().count("_count{"), 0)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_metrics_without_token_require_staff(self):
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+        client = APIClient()
+        client.force_login(self.user)
+        self.assertEqual(client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+        client.force_login(self.staff)
+        self.assertEqual(client.get("/metrics").status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class FlightSearchFilterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="searchuser", password="testpass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        boryspil = Airport.objects.create(name="Boryspil", closest_biggest_city="Kyiv")
+        zhuliany = Airport.objects.create(name="Zhuliany", closest_biggest_city="Kyiv")
+        lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        odesa = Airport.objects.create(name="Odesa Intl", closest_biggest_city="Odesa")
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        self.friday = (timezone.now() + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        def fly(source, destination, departs_in):
+            route, _ = Route.objects.get_or_create(source=source, destination=destination, defaults={"distance": 500})
+            departure = self.friday + departs_in
+            return Flight.objects.create(
+                route=route, airplane=airplane, departure_time=departure, arrival_time=departure + timedelta(hours=1)
+            )
+
+        self.boryspil_friday = fly(boryspil, lviv, timedelta(hours=8))
+        self.zhuliany_friday = fly(zhuliany, lviv, timedelta(hours=12))
+        self.boryspil_saturday = fly(boryspil, lviv, timedelta(days=1, hours=8))
+        fly(boryspil, odesa, timedelta(hours=9))
+        fly(lviv, boryspil, timedelta(hours=10))
+
+    def search(self, **params):
+        response = self.client.get("/api/v1/flights/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [flight["id"] for flight in response.data["results"]]
+
+    def test_city_and_date_range_in_one_query(self):
+        with self.assertNumQueries(2):  # the user, then the flights
+            found = self.search(
+                source_city="Kyiv",
+                destination_city="Lviv",
+                departure_after=self.friday.isoformat(),
+                departure_before=(self.friday + timedelta(days=1)).isoformat(),
+            )
+        self.assertEqual(found, [self.boryspil_friday.id, self.zhuliany_friday.id])
+
+    def test_airport_names(self):
+        found = self.search(source_airport="Boryspil", destination_airport="Lviv Danylo Halytskyi")
+        self.assertEqual(found, [self.boryspil_friday.id, self.boryspil_saturday.id])
+
+    def test_invalid_date(self):
+        response = self.client.get("/api/v1/flights/", {"departure_after": "next friday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncFlightEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="asyncuser", password="testpass")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        kyiv = Airport.objects.create(name="Kyiv Boryspil", closest_biggest_city="Kyiv")
+        lviv = Airport.objects.create(name="Lviv Danylo Halytskyi", closest_biggest_city="Lviv")
+        odesa = Airport.objects.create(name="Odesa Intl", closest_biggest_city="Odesa")
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        self.kyiv_lviv = Route.objects.create(source=kyiv, destination=lviv, distance=540)
+        lviv_odesa = Route.objects.create(source=lviv, destination=odesa, distance=620)
+        self.start = (timezone.now() + timedelta(days=7)).replace(hour=6, minute=0, second=0, microsecond=0)
+        self.search = {"from": kyiv.id, "to": odesa.id, "departure_after": self.start.isoformat()}
+        for hour in range(5):
+            for route in (self.kyiv_lviv, lviv_odesa):
+                departure = self.start + timedelta(hours=hour * 2 + (route == lviv_odesa) * 3)
+                Flight.objects.create(
+                    route=route, airplane=airplane,
+                    departure_time=departure, arrival_time=departure + timedelta(hours=1),
+                )
+
+    def get_async(self, path, params=None, token=True):
+        headers = {"Authorization": f"Bearer {self.token}"} if token else {}
+        return async_to_sync(self.async_client.get)(path, params or {}, headers=headers)
+
+    def test_list_matches_sync_endpoint(self):
+        expected = self.client.get("/api/v1/flights/", {"route": self.kyiv_lviv.id}).json()["results"]
+        response = self.get_async("/api/v1/async/flights/", {"route": self.kyiv_lviv.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], expected)
+
+    def test_list_keyset_pages(self):
+        response = self.get_async("/api/v1/async/flights/", {"page_size": 4})
+        seen = [flight["id"] for flight in response.json()["results"]]
+        while response.json()["next"]:
+            response = self.get_async(response.json()["next"])
+            seen += [flight["id"] for flight in response.json()["results"]]
+        expected = list(Flight.objects.order_by("departure_time", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+        invalid = self.get_async("/api/v1/async/flights/", {"cursor": "not-a-cursor"})
+        self.assertEqual(invalid.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_itineraries_match_sync_endpoint(self):
+        expected = self.client.get("/api/v1/flights/itineraries/", self.search).json()
+        response = self.get_async("/api/v1/async/flights/itineraries/", self.search)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected)
+        self.assertTrue(expected)
+
+    def test_validation_and_authentication(self):
+        self.assertEqual(
+            self.get_async("/api/v1/async/flights/itineraries/", {"to": 1}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.get_async("/api/v1/async/flights/", {"min_seats": "many"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.get_async("/api/v1/async/flights/", token=False).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        for header in ("Bearer", "Bearer a b", "Bearer not-a-jwt"):
+            with self.subTest(header=header):
+                response = async_to_sync(self.async_client.get)(
+                    "/api/v1/async/flights/", headers={"Authorization": header}
+                )
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @mock.patch.object(jwt_settings, "CHECK_REVOKE_TOKEN", True)
+    def test_revoked_token_is_rejected(self):
+        user_cache.clear()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.get_async("/api/v1/async/flights/").status_code, status.HTTP_200_OK)
+        revoked = self.token
+        self.user.set_password("newpass")
+        self.user.save()
+        # Once on a cache miss, then on a hit after the current token reloaded the user.
+        self.assertEqual(self.get_async("/api/v1/async/flights/").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.get_async("/api/v1/async/flights/").status_code, status.HTTP_200_OK)
+        self.token = revoked
+        self.assertEqual(self.get_async("/api/v1/async/flights/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_async_requests_are_measured(self):
+        response = self.get_async("/api/v1/async/flights/")
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+
+class ThroughputBenchmarkTests(TransactionTestCase):
+    def test_both_stacks_are_measured(self):
+        seed_dataset(300)
+        results = ThroughputBenchmark(requests=8, concurrency=4).run()
+        self.assertEqual(set(results), {"list flights", "search itineraries"})
+        for stacks in results.values():
+            self.assertEqual(set(stacks), {"wsgi", "asgi"})
+            for result in stacks.values():
+                self.assertGreater(result["requests_per_second"], 0)
+
+
+class QueryPlanTests(TestCase):
+    def test_list_filters_use_indexes(self):
+        out = io.StringIO()
+        call_command("check_query_plans", stdout=out)
+        self.assertIn("no full scans", out.getvalue())
+
+    def test_full_scan_is_detected(self):
+        tables, plan = full_scans(Flight.objects.filter(arrival_time__gte=timezone.now()))
+        self.assertEqual(tables, [Flight._meta.db_table])
+        tables, plan = full_scans(Flight.objects.filter(route_id=1, departure_time__gte=timezone.now()))
+        self.assertEqual(tables, [])
+        self.assertIn("flight_route_departure_idx", plan)
+
+    def test_unsupported_vendor_is_reported(self):
+        with mock.patch("AirportApp.queryplans.connection") as fake_connection:
+            fake_connection.vendor = "mysql"
+            with self.assertRaisesMessage(CommandError, "do not support the mysql database backend"):
+                call_command("check_query_plans", stdout=io.StringIO())
+
+    def test_composite_indexes_serve_foreign_key_lookups(self):
+        tables, plan = full_scans(Order.objects.filter(user_id=1))
+        self.assertEqual(tables, [])
+        self.assertIn("order_user_created_idx", plan)
+        tables, plan = full_scans(Flight.objects.filter(route_id=1))
+        self.assertEqual(tables, [])
+        self.assertIn("flight_route_departure_idx", plan)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(lambda request: self.router.db_for_read(Flight))
+
+    def read_alias(self, method, token="Bearer one"):
+        request = getattr(self.factory, method)("/api/v1/flights/", HTTP_AUTHORIZATION=token)
+        return self.middleware(request)
+
+    def test_safe_methods_read_from_replica(self):
+        self.assertEqual(self.read_alias("get"), "replica1")
+        self.assertEqual(self.read_alias("head"), "replica1")
+        self.assertIsNone(self.router.db_for_read(Flight))
+        self.assertEqual(self.router.db_for_write(Flight), "default")
+
+    def test_writes_pin_client_to_primary(self):
+        self.assertIsNone(self.read_alias("post"))
+        self.assertIsNone(self.read_alias("get"))
+        self.assertEqual(self.read_alias("get", token="Bearer two"), "replica1")
+        cache.clear()
+        self.assertEqual(self.read_alias("get"), "replica1")
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertTrue(self.router.allow_migrate("default", "AirportApp"))
+        self.assertFalse(self.router.allow_migrate("replica1", "AirportApp"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertIsNone(self.read_alias("get"))
+
+    def test_response_cache_misses_read_from_primary(self):
+        aliases = []
+
+        def handler(request):
+            aliases.append(self.router.db_for_read(Airport))
+            return Response({"count": len(aliases)})
+
+        view = type("View", (CachedResponseMixin,), {"cache_models": (Airport,)})()
+        token = read_alias.set("replica1")
+        try:
+            for _ in range(2):
+                response = view.cached_response(handler, Request(self.factory.get("/api/v1/airports/")))
+            self.assertEqual(self.router.db_for_read(Airport), "replica1")
+        finally:
+            read_alias.reset(token)
+        self.assertEqual(aliases, [None])
+        self.assertEqual(response.data, {"count": 1})
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_performance_middleware_times_every_alias(self):
+        replica = mock.MagicMock()
+        wrapped = []
+
+        def get_response(request):
+            wrapped.append(bool(connection.execute_wrappers))
+            return HttpResponse()
+
+        request = self.factory.get("/api/v1/flights/")
+        request.resolver_match = None
+        with mock.patch("AirportApp.middleware.connections.all", return_value=[connection, replica]):
+            PerformanceMiddleware(get_response)(request)
+        self.assertEqual(wrapped, [True])
+        replica.execute_wrapper.assert_called_once()
+        replica.execute_wrapper.return_value.__exit__.assert_called_once()
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    compose_env = {
+        "DJANGO_DB_NAME": "airport_db",
+        "DJANGO_DB_USER": "airport_user",
+        "DJANGO_DB_PASSWORD": "airport_pass",
+        "DJANGO_DB_HOST": "db",
+        "DJANGO_DB_PORT": "5432",
+    }
+
+    def test_sqlite_fallback(self):
+        settings = database_settings({}, "/tmp/db.sqlite3")
+        self.assertEqual(settings, {"ENGINE": "django.db.backends.sqlite3", "NAME": "/tmp/db.sqlite3"})
+
+    def test_postgresql_from_compose_environment_is_pooled(self):
+        settings = database_settings(self.compose_env, "/tmp/db.sqlite3")
+        self.assertEqual(settings["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((settings["HOST"], settings["NAME"], settings["USER"]), ("db", "airport_db", "airport_user"))
+        self.assertEqual(settings["OPTIONS"]["pool"]["max_size"], 10)
+        self.assertEqual(settings["OPTIONS"]["options"], "-c statement_timeout=30000")
+        self.assertEqual(settings["CONN_MAX_AGE"], 0)
+        self.assertTrue(settings["CONN_HEALTH_CHECKS"])
+
+    def test_persistent_connections_without_pool(self):
+        env = {**self.compose_env, "DJANGO_DB_POOL": "false", "DJANGO_DB_CONN_MAX_AGE": "300",
+               "DJANGO_DB_STATEMENT_TIMEOUT_MS": "0"}
+        settings = database_settings(env, "/tmp/db.sqlite3")
+        self.assertEqual(settings["CONN_MAX_AGE"], 300)
+        self.assertEqual(settings["OPTIONS"], {})
+
+    def test_replicas(self):
+        primary = database_settings(self.compose_env, "/tmp/db.sqlite3")
+        replica = replica_settings(primary, "replica-db:6432")
+        self.assertEqual((replica["HOST"], replica["PORT"]), ("replica-db", "6432"))
+        self.assertEqual(replica["TEST"], {"MIRROR": "default"})
+        self.assertIsNot(replica["OPTIONS"], primary["OPTIONS"])
+        sqlite = replica_settings(database_settings({}, "/tmp/db.sqlite3"), "/tmp/replica.sqlite3")
+        self.assertEqual(sqlite["NAME"], "/tmp/replica.sqlite3")
+
+
+class QueryCountTests(APITestCase):
+    """Query counts of list/retrieve endpoints must not grow with row count."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="queryuser", password="testpass")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.airplane_type = AirplaneType.objects.create(name="Embraer 190")
+        self.crew = [
+            Crew.objects.create(first_name=f"Crew{i}", second_name="Member") for i in range(3)
+        ]
+        self.created = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            source = Airport.objects.create(name=f"Src {i}", closest_biggest_city=f"City {i}")
+            destination = Airport.objects.create(name=f"Dst {i}", closest_biggest_city=f"Town {i}")
+            route = Route.objects.create(source=source, destination=destination, distance=100 + i)
+            airplane = Airplane.objects.create(
+                name=f"Plane {i}", rows=10, seats_in_row=4, airplane_type=self.airplane_type
+            )
+            flight = Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=timezone.now() + timedelta(days=1),
+                arrival_time=timezone.now() + timedelta(days=1, hours=2),
+            )
+            flight.crew.set(self.crew)
+            order = Order.objects.create(user=self.user)
+            Ticket.objects.create(row=1, seat=1, flight=flight, order=order)
+            Ticket.objects.create(row=1, seat=2, flight=flight, order=order)
+
+    def count_queries(self, url):
+        # Measure the endpoint itself, not the reference-data response or user caches.
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def assert_constant_queries(self, url):
+        self.add_rows(1)
+        small = self.count_queries(url)
+        self.add_rows(5)
+        large = self.count_queries(url)
+        self.assertEqual(small, large, f"{url} query count grows with rows: {small} -> {large}")
+
+    def test_list_endpoints_constant_queries(self):
+        for url in (
+            "/api/v1/airports/",
+            "/api/v1/crew/",
+            "/api/v1/airplane-types/",
+            "/api/v1/airplanes/",
+            "/api/v1/routes/",
+            "/api/v1/flights/",
+            "/api/v1/orders/",
+            "/api/v1/tickets/",
+        ):
+            with self.subTest(url=url):
+                self.assert_constant_queries(url)
+
+    def test_retrieve_endpoints_constant_queries(self):
+        self.add_rows(1)
+        flight = Flight.objects.get()
+        ticket = Ticket.objects.first()
+        retrieve_urls = (
+            f"/api/v1/flights/{flight.id}/",
+            f"/api/v1/tickets/{ticket.id}/",
+            f"/api/v1/routes/{flight.route_id}/",
+            f"/api/v1/airplanes/{flight.airplane_id}/",
+            f"/api/v1/orders/{ticket.order_id}/",
+        )
+        before = [self.count_queries(url) for url in retrieve_urls]
+        self.crew.extend(
+            Crew.objects.create(first_name=f"Extra{i}", second_name="Member") for i in range(5)
+        )
+        flight.crew.set(self.crew)
+        after = [self.count_queries(url) for url in retrieve_urls]
+        self.assertEqual(before, after)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username="cached", password="testpass", email="old@example.com")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/me/").status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get("/me/")
+        self.assertEqual(response.data["username"], "cached")
+
+    def test_password_change_reloads_user(self):
+        self.client.get("/me/")
+        self.user.set_password("newpass")
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/me/").status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get("/me/")
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertEqual(self.client.get("/me/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_schema_documents_bearer_authentication(self):
+        schema = self.client.get("/api/schema/", HTTP_ACCEPT="application/json").json()
+        self.assertIn("jwtAuth", schema["components"]["securitySchemes"])
+        self.assertIn({"jwtAuth": []}, schema["paths"]["/api/v1/flights/"]["get"]["security"])
+
+    @override_settings(JWT_USER_CACHE_SIZE=2)
+    def test_least_recently_used_user_is_dropped(self):
+        for user_id in (1, 2, 3):
+            user_cache.set(user_id, "v", User(pk=user_id))
+        self.assertIsNone(user_cache.get(1, "v"))
+        self.assertEqual(user_cache.get(3, "v").pk, 3)
+        self.assertIsNone(user_cache.get(3, "other"))
+
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sparse", password="testpass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        source = Airport.objects.create(name="Boryspil", closest_biggest_city="Kyiv")
+        destination = Airport.objects.create(name="Lviv", closest_biggest_city="Lviv")
+        route = Route.objects.create(source=source, destination=destination, distance=470)
+        airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        airplane = Airplane.objects.create(name="UR-AAA", rows=20, seats_in_row=6, airplane_type=airplane_type)
+        departure = timezone.now() + timedelta(days=1)
+        self.flight = Flight.objects.create(
+            route=route, airplane=airplane, departure_time=departure, arrival_time=departure + timedelta(hours=1)
+        )
+        self.flight.crew.set([Crew.objects.create(first_name="Anna", second_name="Pilot")])
+        order = Order.objects.create(user=self.user)
+        self.ticket = Ticket.objects.create(row=1, seat=2, flight=self.flight, order=order)
+        self.client.get("/me/")  # resolve the user once, so counts below are the endpoint's
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [query["sql"] for query in ctx.captured_queries]
+
+    def test_ticket_fields_skip_flight_joins_and_crew(self):
+        data, queries = self.get("/api/v1/tickets/", fields="id,seat")
+        self.assertEqual(data["results"], [{"id": self.ticket.id, "seat": 2}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("AirportApp_flight", queries[0])
+        self.assertNotIn('"row"', queries[0])
+
+    def test_nested_ticket_fields(self):
+        data, queries = self.get("/api/v1/tickets/", fields="id,flight.id,flight.route.distance")
+        self.assertEqual(
+            data["results"][0],
+            {"id": self.ticket.id, "flight": {"id": self.flight.id, "route": {"distance": 470}}},
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("crew", queries[0])
+
+    def test_flight_expansion(self):
+        data, queries = self.get("/api/v1/flights/", expand="route,crew")
+        flight = data["results"][0]
+        self.assertEqual(flight["route"]["source"]["name"], "Boryspil")
+        self.assertEqual(flight["crew"][0]["first_name"], "Anna")
+        self.assertEqual(flight["airplane"], "UR-AAA (Boeing 737)")
+        self.assertEqual(len(queries), 2)  # flights with their joins, then crew
+
+    def test_flight_list_fields_stay_on_fast_path(self):
+        data, queries = self.get("/api/v1/flights/", fields="id,seats_available")
+        self.assertEqual(data["results"], [{"id": self.flight.id, "seats_available": 119}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("AirportApp_airport", queries[0])
+
+    def test_retrieve_loads_only_rendered_columns(self):
+        data, queries = self.get(f"/api/v1/flights/{self.flight.id}/", fields="id,departure_time")
+        self.assertEqual(set(data), {"id", "departure_time"})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("seat_map", queries[0])
+
+    def test_writes_are_not_shaped(self):
+        response = self.client.post(
+            "/api/v1/tickets/?fields=id",
+            {"row": 3, "seat": 1, "flight": self.flight.id, "order": self.ticket.order_id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["row"], 3)
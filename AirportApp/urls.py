@@ -1,6 +1,9 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+
+from .async_views import flight_itineraries, flight_list
 from .views import AirportViewSet, CrewViewSet, AirplaneTypeViewSet, AirplaneViewSet, RouteViewSet, FlightViewSet, \
-    OrderViewSet, TicketViewSet
+    OrderViewSet, TicketViewSet, SeatHoldViewSet
 
 app_name = "AirportApp"
 router = DefaultRouter()
@@ -12,4 +15,8 @@ router.register(r'routes', RouteViewSet)
 router.register(r'flights', FlightViewSet)
 router.register(r'orders', OrderViewSet)
 router.register(r'tickets', TicketViewSet)
-urlpatterns = router.urls
\ No newline at end of file
+router.register(r'holds', SeatHoldViewSet)
+urlpatterns = router.urls + [
+    path("async/flights/", flight_list, name="flight-list-async"),
+    path("async/flights/itineraries/", flight_itineraries, name="flight-itineraries-async"),
+]
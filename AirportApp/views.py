@@ -1,47 +1,110 @@
+from datetime import timedelta
+
 import django_filters
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import Crew, Ticket, Airport, Airplane, AirplaneType, Route, Flight, Order
+from .models import Crew, Ticket, Airport, Airplane, AirplaneType, Route, Flight, Order, SeatHold
+from .aggregates import GroupConcat
+from .authentication import CachedJWTAuthentication
+from .booking import confirm_hold, release_hold, save_ticket
+from .cache import CachedResponseMixin
+from .exports import ExportMixin
+from .fastpath import FastListMixin, airplane_label, airport_label, route_label
+from .filters import FlightFilter
+from .itinerary import search_itineraries
+from .metrics import SerializerTimingMixin, registry
+from .routegraph import get_route_graph, invalidate_route_graph
+from .seatmap import SeatMap
+from .sparse import is_shaped, model_fields, ordering_fields, shaped_relations
+from .pagination import FlightPagination, OrderPagination, TicketPagination
 from .serializers import AirportSerializer, CrewSerializer, AirplaneTypeSerializer, AirplaneSerializer, \
     AirplaneDetailSerializer, AirplaneListSerializer, RouteSerializer, RouteListSerializer, RouteDetailSerializer, \
     FlightSerializer, FlightListSerializer, FlightDetailSerializer, OrderSerializer, OrderDetailSerializer, \
     OrderListSerializer, TicketSerializer, TicketListSerializer, TicketDetailSerializer, UserSerializer, \
-    AutoOrderSerializer
+    AutoOrderSerializer, BulkOrderSerializer, ItinerarySearchSerializer, OrderSummarySerializer, \
+    SeatHoldSerializer
 from rest_framework import generics
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.settings import api_settings
 
-class AirportViewSet(viewsets.ModelViewSet):
-    queryset = Airport.objects.all().prefetch_related()
+
+class EagerLoadingMixin:
+    """
+    Applies per-action select_related/prefetch_related plans in get_queryset.
+
+    Each plan is a mapping of action name to the relations the serializer
+    used by that action will touch, so rendering N rows costs a fixed number
+    of queries instead of one per row. When a `sparse_actions` request asks
+    for `?fields=` or `?expand=`, the plans follow the shaped serializer:
+    relations it no longer renders are dropped, expanded ones are added and
+    only the columns it reads are loaded.
+    """
+    select_related_by_action = {}
+    prefetch_related_by_action = {}
+    sparse_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related = self.select_related_by_action.get(self.action)
+        prefetch_related = self.prefetch_related_by_action.get(self.action)
+        if self.action in self.sparse_actions and is_shaped(getattr(self, "request", None)):
+            serializer = self.get_serializer()
+            select_related, prefetch_related = shaped_relations(
+                serializer, select_related or (), prefetch_related or ()
+            )
+            only = model_fields(serializer, queryset.model, queryset.query.annotations)
+            if only is not None:
+                queryset = queryset.only(*only, *ordering_fields(self))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class AirportViewSet(SerializerTimingMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Airport.objects.all()
     serializer_class = AirportSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['name', 'closest_biggest_city']
 
 
 
-class CrewViewSet(viewsets.ModelViewSet):
-    queryset = Crew.objects.all().prefetch_related()
+class CrewViewSet(SerializerTimingMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['first_name', 'second_name']
 
-class AirplaneTypeViewSet(viewsets.ModelViewSet):
-    queryset = AirplaneType.objects.all().prefetch_related()
+class AirplaneTypeViewSet(SerializerTimingMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['name']
 
 
-class AirplaneViewSet(viewsets.ModelViewSet):
-    queryset = Airplane.objects.all().prefetch_related()
+class AirplaneViewSet(SerializerTimingMixin, CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Airplane.objects.all()
     serializer_class = AirplaneSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['name', 'airplane_type']
+    cache_models = (Airplane, AirplaneType)
+    select_related_by_action = {
+        "list": ("airplane_type",),
+        "retrieve": ("airplane_type",),
+    }
+
     def get_serializer_class(self):
         if self.action == "list":
             return AirplaneListSerializer
@@ -49,11 +112,24 @@ class AirplaneViewSet(viewsets.ModelViewSet):
             return AirplaneDetailSerializer
         return AirplaneSerializer
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(SerializerTimingMixin, CachedResponseMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['source','destination']
+    cache_models = (Route, Airport)
+    fast_list_fields = RouteListSerializer.Meta.fields
+    fast_list_labels = {
+        "source": airport_label("source"),
+        "destination": airport_label("destination"),
+    }
+    select_related_by_action = {
+        "list": ("source", "destination"),
+        "retrieve": ("source", "destination"),
+    }
+    default_max_legs = 3
+    max_legs_limit = 8
+
     def get_serializer_class(self):
         if self.action == "list":
             return RouteListSerializer
@@ -61,12 +137,72 @@ class RouteViewSet(viewsets.ModelViewSet):
             return RouteDetailSerializer
         return RouteSerializer
 
+    @action(detail=False, methods=["get"])
+    def path(self, request):
+        try:
+            source_id = int(request.query_params["from"])
+            destination_id = int(request.query_params["to"])
+            max_legs = int(request.query_params.get("max_legs", self.default_max_legs))
+        except KeyError:
+            raise ValidationError("Both 'from' and 'to' airport ids are required.")
+        except ValueError:
+            raise ValidationError("'from', 'to' and 'max_legs' must be integers.")
+        if not 1 <= max_legs <= self.max_legs_limit:
+            raise ValidationError(f"'max_legs' must be between 1 and {self.max_legs_limit}.")
 
-class FlightViewSet(viewsets.ModelViewSet):
-    queryset = Flight.objects.all().prefetch_related()
+        # The graph may predate a route deletion: rebuild it once if a leg is gone.
+        for attempt in range(2):
+            found = get_route_graph().shortest_path(source_id, destination_id, max_legs)
+            if found is None:
+                raise NotFound("No path between these airports.")
+            distance, route_ids = found
+            routes = Route.objects.select_related("source", "destination").in_bulk(route_ids)
+            if len(routes) == len(set(route_ids)):
+                break
+            invalidate_route_graph()
+        else:
+            raise NotFound("No path between these airports.")
+        legs = [routes[route_id] for route_id in route_ids]
+        return Response({
+            "from": source_id,
+            "to": destination_id,
+            "distance": distance,
+            "legs": RouteListSerializer(legs, many=True).data,
+        })
+
+
+class FlightViewSet(SerializerTimingMixin, ExportMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Flight.objects.all()
     serializer_class = FlightSerializer
+    pagination_class = FlightPagination
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
-    filterset_fields = ['route','airplane']
+    filterset_class = FlightFilter
+    fast_list_fields = FlightListSerializer.Meta.fields
+    fast_list_labels = {
+        "route": route_label("route"),
+        "airplane": airplane_label("airplane"),
+    }
+    export_columns = (
+        ("id", "id"),
+        ("route", route_label("route")),
+        ("source", "route__source__name"),
+        ("destination", "route__destination__name"),
+        ("distance", "route__distance"),
+        ("airplane", airplane_label("airplane")),
+        ("departure_time", "departure_time"),
+        ("arrival_time", "arrival_time"),
+        ("seats_sold", "seats_sold"),
+        ("seats_available", "seats_available"),
+    )
+    select_related_by_action = {
+        "list": ("route__source", "route__destination", "airplane__airplane_type"),
+        "retrieve": ("route__source", "route__destination", "airplane"),
+        "seats": ("airplane",),
+    }
+    prefetch_related_by_action = {
+        "retrieve": ("crew",),
+    }
+
     def get_serializer_class(self):
         if self.action == "list":
             return FlightListSerializer
@@ -74,10 +210,93 @@ class FlightViewSet(viewsets.ModelViewSet):
             return FlightDetailSerializer
         return FlightSerializer
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().prefetch_related()
+    @action(detail=True, methods=["get"])
+    def seats(self, request, pk=None):
+        flight = self.get_object()
+        seat_map = SeatMap.for_flight(flight)
+        return Response({
+            "flight": flight.id,
+            "rows": seat_map.rows,
+            "seats_in_row": seat_map.seats_in_row,
+            "available": seat_map.free_count(),
+            "seats": seat_map.as_rows(),
+        })
+
+    @action(detail=False, methods=["get"])
+    def itineraries(self, request):
+        query = ItinerarySearchSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        found = search_itineraries(
+            params["from"],
+            params["to"],
+            params["departure_after"],
+            params["departure_before"],
+            max_legs=params["max_legs"],
+            min_connection=timedelta(minutes=params["min_connection"]),
+            max_connection=timedelta(minutes=params["max_connection"]),
+            sort=params["sort"],
+            limit=params["limit"],
+            min_seats=params["passengers"],
+        )
+
+        flight_ids = {flight_id for itinerary in found for flight_id in itinerary["flights"]}
+        flights = Flight.objects.select_related(
+            *self.select_related_by_action["list"]
+        ).in_bulk(flight_ids)
+        return Response(itinerary_rows(found, flights))
+
+
+def itinerary_rows(found, flights):
+    """
+    Response rows for `search_itineraries` results, given their flights by
+    id. Itineraries with a flight deleted since the search are left out.
+    """
+    return [
+        {
+            "departure_time": itinerary["departure_time"],
+            "arrival_time": itinerary["arrival_time"],
+            "duration_minutes": int(itinerary["duration"].total_seconds() // 60),
+            "distance": itinerary["distance"],
+            "flights": FlightListSerializer(
+                [flights[flight_id] for flight_id in itinerary["flights"]], many=True
+            ).data,
+        }
+        for itinerary in found
+        if all(flight_id in flights for flight_id in itinerary["flights"])
+    ]
+
+
+class OrderViewSet(SerializerTimingMixin, ExportMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
+    select_related_by_action = {
+        "retrieve": ("user",),
+    }
+    sparse_actions = ("list", "retrieve", "mine")
+    export_columns = (
+        ("id", "id"),
+        ("created_at", "created_at"),
+        ("user_id", "user_id"),
+        ("username", "user__username"),
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=self.request.user)
+        if self.action == "mine":
+            now = timezone.now()
+            queryset = queryset.annotate(
+                ticket_count=Count("ticket"),
+                flight_ids=GroupConcat("ticket__flight_id", distinct=True),
+                next_departure=Min(
+                    "ticket__flight__departure_time",
+                    filter=Q(ticket__flight__departure_time__gte=now),
+                ),
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.action == "list":
             return OrderListSerializer
@@ -85,13 +304,69 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderDetailSerializer
         if self.action == "create":
             return AutoOrderSerializer
+        if self.action == "bulk":
+            return BulkOrderSerializer
+        if self.action == "mine":
+            return OrderSummarySerializer
         return OrderSerializer
 
-class TicketViewSet(viewsets.ModelViewSet,generics.ListAPIView):
-    queryset = Ticket.objects.all().prefetch_related()
+    @action(detail=False, methods=["get"])
+    def mine(self, request):
+        """The user's orders with ticket count, flights and next departure, in one query."""
+        return self.list(request)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class TicketViewSet(SerializerTimingMixin, ExportMixin, EagerLoadingMixin, viewsets.ModelViewSet,generics.ListAPIView):
+    queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
+    pagination_class = TicketPagination
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_fields = ['row','seat','flight','order']
+    select_related_by_action = {
+        "list": (
+            "flight__route__source",
+            "flight__route__destination",
+            "flight__airplane",
+            "order__user",
+        ),
+        "retrieve": (
+            "flight__route__source",
+            "flight__route__destination",
+            "flight__airplane__airplane_type",
+            "order",
+        ),
+    }
+    prefetch_related_by_action = {
+        "list": ("flight__crew",),
+    }
+    export_columns = (
+        ("id", "id"),
+        ("row", "row"),
+        ("seat", "seat"),
+        ("order_id", "order_id"),
+        ("username", "order__user__username"),
+        ("flight_id", "flight_id"),
+        ("route", route_label("flight__route")),
+        ("airplane", "flight__airplane__name"),
+        ("departure_time", "flight__departure_time"),
+        ("arrival_time", "flight__arrival_time"),
+    )
+
+    def get_queryset(self):
+        return super().get_queryset().filter(order__user=self.request.user)
+
+    def perform_create(self, serializer):
+        save_ticket(serializer)
+
+    def perform_update(self, serializer):
+        save_ticket(serializer)
+
     def get_serializer_class(self):
         if self.action == "list":
             return TicketListSerializer
@@ -100,15 +375,50 @@ class TicketViewSet(viewsets.ModelViewSet,generics.ListAPIView):
         return TicketSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class SeatHoldViewSet(
+    SerializerTimingMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Live seat holds of the current user; DELETE releases a hold early."""
+    queryset = SeatHold.objects.select_related("flight__airplane")
+    serializer_class = SeatHoldSerializer
+    lookup_value_regex = r"\d+"
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user, expires_at__gt=timezone.now())
+
+    def perform_destroy(self, instance):
+        release_hold(self.request.user, instance.pk)
+
+    @action(detail=True, methods=["post"])
+    def confirm(self, request, pk=None):
+        order = confirm_hold(request.user, pk)
+        return Response(BulkOrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
+def metrics_view(request):
+    if settings.METRICS_TOKEN:
+        allowed = request.headers.get("Authorization") == f"Bearer {settings.METRICS_TOKEN}"
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class CreateUserView(SerializerTimingMixin, generics.CreateAPIView):
     permission_classes = []
     serializer_class = UserSerializer
 
 class MyTokenObtainPairView(TokenObtainPairView):
     permission_classes = [AllowAny]
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(SerializerTimingMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):